@@ -0,0 +1,190 @@
+"""Sound synthesis for effects and background music.
+
+Waveforms are generated as whole NumPy arrays in the mixer's actual sample
+rate, sample format and channel count (see ``pygame.mixer.get_init()``).
+Each rendered PCM buffer is memoized in memory and also written to
+``SOUND_CACHE_DIR``, so later launches and music toggles load raw bytes
+instead of synthesizing. NumPy is only needed on a cache miss, so it is
+imported on the first one rather than at start-up. Without NumPy the same
+waveforms are built sample by sample with ``math`` and ``array``, which is
+slower but only happens once per cache entry.
+"""
+import array
+import functools
+import hashlib
+import importlib.util
+import math
+import os
+import tempfile
+
+import pygame
+
+np = None  # numpy, once load_numpy() has imported it
+
+SOUND_CACHE_DIR = "sound_cache"
+
+# name -> waveform parameters; changing a spec invalidates its cache entry
+SOUND_SPECS = {
+    'shoot': {'kind': 'tone', 'start_hz': 800, 'end_hz': 800, 'duration_ms': 100, 'amplitude': 0.5},
+    'hit': {'kind': 'tone', 'start_hz': 400, 'end_hz': 400, 'duration_ms': 100, 'amplitude': 0.5},
+    'game_over': {'kind': 'tone', 'start_hz': 600, 'end_hz': 200, 'duration_ms': 200, 'amplitude': 0.5},
+    # Two wobbling voices: A3 +/- E4 and E4 +/- A4
+    'music': {'kind': 'arpeggio', 'duration_ms': 2000, 'amplitude': 0.5,
+              'voices': ((220, 110, 0.5), (330, 165, 0.75))},
+}
+
+
+def have_numpy():
+    """Whether the fast NumPy synthesis can be used (numpy is installed)"""
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("numpy is needed to synthesize sounds") from None
+        np = numpy
+    return np
+
+
+def _phase(freq, sample_rate):
+    """Integrate an instantaneous frequency array into a phase array"""
+    return 2 * np.pi * np.cumsum(freq) / sample_rate
+
+
+def synthesize(spec, sample_rate):
+    """Float waveform in [-1, 1] for a SOUND_SPECS entry
+
+    A NumPy array, or a list of floats if numpy isn't installed.
+    """
+    samples = int(sample_rate * spec['duration_ms'] / 1000)
+    if not have_numpy():
+        return _synthesize_python(spec, sample_rate, samples)
+    load_numpy()
+    if spec['kind'] == 'tone':
+        # Linear sweep from start_hz to end_hz (a constant tone if equal)
+        freq = np.linspace(spec['start_hz'], spec['end_hz'], samples, endpoint=False)
+        return spec['amplitude'] * np.sin(_phase(freq, sample_rate))
+    if spec['kind'] == 'arpeggio':
+        t = np.arange(samples) / sample_rate
+        wave = np.zeros(samples)
+        for base_hz, depth_hz, rate_hz in spec['voices']:
+            freq = base_hz + depth_hz * np.sin(2 * np.pi * rate_hz * t)
+            wave += np.sin(_phase(freq, sample_rate))
+        return spec['amplitude'] * wave / len(spec['voices'])
+    raise ValueError(f"Unknown sound kind: {spec['kind']}")
+
+
+def _synthesize_python(spec, sample_rate, samples):
+    """synthesize() without numpy: the same waveforms, one sample at a time"""
+    step = 2 * math.pi / sample_rate
+    if spec['kind'] == 'tone':
+        start_hz = spec['start_hz']
+        sweep_hz = spec['end_hz'] - start_hz
+        amplitude = spec['amplitude']
+        wave = []
+        phase = 0.0
+        for i in range(samples):
+            phase += (start_hz + sweep_hz * i / samples) * step
+            wave.append(amplitude * math.sin(phase))
+        return wave
+    if spec['kind'] == 'arpeggio':
+        wave = [0.0] * samples
+        for base_hz, depth_hz, rate_hz in spec['voices']:
+            phase = 0.0
+            for i in range(samples):
+                phase += (base_hz + depth_hz * math.sin(2 * math.pi * rate_hz * i / sample_rate)) * step
+                wave[i] += math.sin(phase)
+        scale = spec['amplitude'] / len(spec['voices'])
+        return [value * scale for value in wave]
+    raise ValueError(f"Unknown sound kind: {spec['kind']}")
+
+
+# Mixer size code -> array typecode for the numpy-free path
+PCM_TYPECODES = {8: 'B', -8: 'b', 16: 'H', -16: 'h', 32: 'f', -32: 'i'}
+
+
+def _to_pcm_python(wave, sample_format, channels):
+    """to_pcm() for a list waveform, through array.array"""
+    typecode = PCM_TYPECODES.get(sample_format)
+    if typecode is None:
+        raise ValueError(f"Unsupported mixer format: {sample_format}")
+    if sample_format == 32:
+        values = wave
+    elif sample_format < 0:
+        peak = 2 ** (-sample_format - 1) - 1
+        values = [round(value * peak) for value in wave]
+    else:
+        half = 2 ** (sample_format - 1)
+        values = [round(value * (half - 1) + half) for value in wave]
+    if channels > 1:
+        values = [value for value in values for _ in range(channels)]
+    return array.array(typecode, values).tobytes()
+
+
+def to_pcm(wave, sample_format, channels):
+    """Convert a float waveform to interleaved PCM bytes for the mixer format
+
+    ``sample_format`` is the pygame/SDL size code: 8, -8, 16, -16, -32 or
+    32 (negative means signed, 32 is float).
+    """
+    if isinstance(wave, list):
+        return _to_pcm_python(wave, sample_format, channels)
+    if sample_format == 32:
+        pcm = wave.astype(np.float32)
+    elif sample_format in (-8, -16, -32):
+        bits = -sample_format
+        peak = 2 ** (bits - 1) - 1
+        pcm = np.round(wave * peak).astype({8: np.int8, 16: np.int16, 32: np.int32}[bits])
+    elif sample_format in (8, 16):
+        half = 2 ** (sample_format - 1)
+        pcm = np.round(wave * (half - 1) + half).astype(np.uint8 if sample_format == 8 else np.uint16)
+    else:
+        raise ValueError(f"Unsupported mixer format: {sample_format}")
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1)
+    return pcm.tobytes()
+
+
+def _cache_path(name, sample_rate, sample_format, channels):
+    key = repr((SOUND_SPECS[name], sample_rate, sample_format, channels)).encode()
+    digest = hashlib.sha1(key).hexdigest()[:16]
+    return os.path.join(SOUND_CACHE_DIR, f"{name}-{digest}.pcm")
+
+
+@functools.lru_cache(maxsize=None)
+def pcm_bytes(name, sample_rate, sample_format, channels):
+    """PCM for a named sound, from memory, the disk cache or fresh synthesis"""
+    path = _cache_path(name, sample_rate, sample_format, channels)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    data = to_pcm(synthesize(SOUND_SPECS[name], sample_rate), sample_format, channels)
+    try:
+        os.makedirs(SOUND_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SOUND_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache sound {name}: {e}")
+    return data
+
+
+@functools.lru_cache(maxsize=None)
+def _make_sound(name, mixer_format):
+    return pygame.mixer.Sound(buffer=pcm_bytes(name, *mixer_format))
+
+
+def make_sound(name):
+    """pygame Sound for a SOUND_SPECS entry in the current mixer format"""
+    mixer_format = pygame.mixer.get_init()
+    if mixer_format is None:
+        raise RuntimeError("pygame.mixer is not initialized")
+    return _make_sound(name, mixer_format)
@@ -0,0 +1,573 @@
+"""Benchmarks for start-up and the update, collision, rendering, audio and persistence hot paths.
+
+Runs headless (SDL dummy video and audio drivers) in a scratch directory,
+so high scores and the sound cache of the real install are never touched.
+
+    python benchmark.py --output results.json
+    python benchmark.py --compare baseline.json --threshold 0.2
+
+Results are written as JSON (median and best time per call, in ms). With
+``--compare``, any benchmark whose median is more than ``threshold`` slower
+than in the baseline is flagged and the exit status is 1.
+"""
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from game_state import (
+    GameState, WIDTH, HEIGHT, FPS, TARGET_RADIUS, LASER_SPEED, TARGET_SPEED, INPUT_LEFT, INPUT_SHOOT,
+)
+
+DT = 1000 / FPS
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTITY_COUNTS = (10, 100, 1000)
+HISTORY_SIZES = (0, 1000, 100000)
+
+
+def measure(fn, setup=None, number=10, repeat=5):
+    """Time ``fn`` ``number`` times per repeat; ``setup`` runs before each repeat"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        'median_ms': statistics.median(times) * 1000,
+        'min_ms': min(times) * 1000,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def populate(state, count, seed=0):
+    """Put ``count`` lasers and ``count // 4`` targets at random on screen"""
+    rng = random.Random(seed)
+    state.reset(seed)
+    for _ in range(count):
+        state.add_laser(rng.randrange(WIDTH), rng.randrange(100, HEIGHT - 100))
+    for _ in range(max(1, count // 4)):
+        # Far enough from the bottom that no benchmark step ends the game
+        state.add_target(rng.randint(TARGET_RADIUS, WIDTH - TARGET_RADIUS), rng.randrange(0, HEIGHT - 200))
+
+
+def state_classes():
+    classes = [('list', GameState)]
+    try:
+        from entity_store import ArrayGameState
+    except ImportError:
+        pass
+    else:
+        classes.append(('arrays', ArrayGameState))
+    return classes
+
+
+def bench_startup(quick):
+    """Fresh interpreters: importing the game, and up to the first frame on screen"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+
+    def python(code):
+        subprocess.run([sys.executable, "-c", code], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    first_frame = ("import laser_defender as game; game.bootstrap(); game.draw(); game.renderer.present(); "
+                   "game.high_score_manager.close()")
+    repeat = 3 if quick else 5
+    return {
+        "startup/import": measure(lambda: python("import laser_defender"), number=1, repeat=repeat),
+        "startup/first_frame": measure(lambda: python(first_frame), number=1, repeat=repeat),
+    }
+
+
+def bench_update(quick):
+    results = {}
+    for store, state_class in state_classes():
+        for count in ENTITY_COUNTS:
+            state = state_class(seed=0)
+            results[f"update/{store}/{count}"] = measure(
+                lambda: state.step(INPUT_LEFT | INPUT_SHOOT, DT),
+                setup=lambda: populate(state, count), number=20)
+            results[f"collide/{store}/{count}"] = measure(
+                lambda: state.collide([]),
+                setup=lambda: populate(state, count), number=1, repeat=5 if quick else 20)
+            discrete = state_class(seed=0, swept=False)
+            results[f"collide_overlap/{store}/{count}"] = measure(
+                lambda: discrete.collide([]),
+                setup=lambda: populate(discrete, count), number=1, repeat=5 if quick else 20)
+
+    # Narrowphase cost per pair: 1000 laser/target pairs near each other
+    from collision import circle_rect_overlap, swept_circle_rect
+
+    rng = random.Random(0)
+    lasers = [pygame.Rect(rng.randrange(WIDTH), rng.randrange(HEIGHT), 8, 25) for _ in range(1000)]
+    pairs = [(laser.centerx + rng.randrange(-40, 40), laser.centery + rng.randrange(-60, 60), laser)
+             for laser in lasers]
+    reach = LASER_SPEED + TARGET_SPEED  # One tick of relative motion
+    results["narrowphase/overlap/1000_pairs"] = measure(
+        lambda: [circle_rect_overlap(x, y, TARGET_RADIUS, laser) for x, y, laser in pairs], number=20)
+    results["narrowphase/swept/1000_pairs"] = measure(
+        lambda: [swept_circle_rect(x, y - reach, TARGET_RADIUS, reach, laser) for x, y, laser in pairs], number=20)
+    return results
+
+
+def bench_replay(quick):
+    """Encoding, decoding and re-simulating an autopilot game"""
+    from game_state import autopilot
+    from replay import Replay, ReplayRecorder, simulate
+
+    state = GameState(seed=0)
+    recorder = ReplayRecorder()
+    recorder.start(state)
+    while not state.game_over and state.ticks < 20000:
+        inputs = autopilot(state)
+        recorder.record(inputs)
+        state.step(inputs, DT)
+    replay = recorder.replay()
+    data = replay.encode()
+    return {
+        "replay/encode": measure(replay.encode, number=20),
+        "replay/decode": measure(lambda: Replay.decode(data), number=20),
+        f"replay/simulate/{replay.ticks}ticks": measure(lambda: simulate(replay), number=1,
+                                                        repeat=3 if quick else 5),
+    }
+
+
+def bench_vector_env(quick):
+    """One VectorEnv step over 16 games, in-process and with two workers"""
+    try:
+        from vector_env import VectorEnv
+    except ImportError:
+        return {}
+    results = {}
+    actions = [random.Random(i).randrange(8) for i in range(16)]
+    for workers in (0, 2):
+        env = VectorEnv(16, workers, seed=0)
+        env.reset()
+        results[f"vector_env/step/16envs/{workers}workers"] = measure(lambda: env.step(actions), number=100)
+        env.close()
+    return results
+
+
+def bench_spectator(quick):
+    """What publishing a tick costs: snapshot, delta and keyframe encoding, decoding"""
+    from spectator import capture, decode, encode_delta, encode_keyframe
+
+    results = {}
+    for count in ENTITY_COUNTS:
+        state = GameState(seed=0)
+        populate(state, count)
+        previous = capture(state)
+        state.step(INPUT_LEFT | INPUT_SHOOT, DT)
+        snapshot = capture(state)
+        delta = encode_delta(previous, snapshot)
+        results[f"spectator/capture/{count}"] = measure(lambda: capture(state), number=20)
+        results[f"spectator/delta/{count}"] = measure(lambda: encode_delta(previous, snapshot), number=20)
+        results[f"spectator/keyframe/{count}"] = measure(lambda: encode_keyframe(snapshot), number=20)
+        results[f"spectator/decode_delta/{count}"] = measure(lambda: decode(delta, previous), number=20)
+    return results
+
+
+def bench_pipeline(quick):
+    """What the simulation thread adds to each tick in pipelined mode: the snapshot copy"""
+    from pipeline import capture
+
+    results = {}
+    for count in ENTITY_COUNTS:
+        state = GameState(seed=0)
+        populate(state, count)
+        results[f"pipeline/snapshot/{count}"] = measure(lambda: capture(state, 0, 0.0, 0.0, ()), number=20)
+    return results
+
+
+def bench_render(quick):
+    import laser_defender
+    from renderers import DirtyRectRenderer, FullRenderer
+
+    if laser_defender.screen is None:
+        laser_defender.bootstrap()
+    results = {}
+    screen = laser_defender.screen
+    lasers = [pygame.Rect(random.randrange(WIDTH), random.randrange(HEIGHT), 8, 25) for _ in range(100)]
+    for style in range(1, 6):
+        def draw_lasers():
+            for laser in lasers:
+                laser_defender.draw_laser(laser, style)
+        results[f"draw_laser/style{style}/x100"] = measure(draw_lasers, number=20)
+
+    renderers = [('full', FullRenderer(screen, laser_defender.BLACK)),
+                 ('dirty', DirtyRectRenderer(screen, laser_defender.BLACK))]
+    for name, renderer in renderers:
+        laser_defender.renderer = renderer
+        for count in ENTITY_COUNTS:
+            for style in (1, 5):
+                def frame():
+                    laser_defender.draw()
+                    renderer.present()
+
+                def setup():
+                    laser_defender.LASER_STYLE = style
+                    populate(laser_defender.state, count)
+                results[f"draw/{name}/style{style}/{count}"] = measure(frame, setup=setup, number=20)
+    laser_defender.renderer = renderers[0][1]
+
+    # Each quality level with the dirty-rect renderer asked for
+    from governor import QUALITY_NAMES
+    laser_defender.DIRTY_RECTS = True
+    for level, name in enumerate(QUALITY_NAMES):
+        laser_defender.governor.level = level
+        laser_defender.apply_quality()
+
+        def frame():
+            laser_defender.draw()
+            laser_defender.renderer.present()
+        results[f"draw/quality/{name}/1000"] = measure(
+            frame, setup=lambda: populate(laser_defender.state, 1000), number=20)
+    laser_defender.governor.level = 0
+    laser_defender.DIRTY_RECTS = False
+    laser_defender.apply_quality()
+
+    manager = laser_defender.high_score_manager
+    for score in range(1, 11):
+        manager.add_score(score * 10)
+    laser_defender.show_high_scores = True
+
+    renderer = laser_defender.renderer
+
+    def overlay_frame():
+        renderer.begin([])
+        laser_defender.draw_high_score_screen()
+        renderer.end()
+
+    def rebuild():
+        manager.version += 1
+        overlay_frame()
+    results["draw_high_score_screen/cached"] = measure(overlay_frame, number=50)
+    results["draw_high_score_screen/rebuild"] = measure(rebuild, number=10)
+    laser_defender.show_high_scores = False
+    return results
+
+
+PARTICLE_COUNTS = (1000, 10000)
+
+
+def bench_particles(quick):
+    """Particle update and drawing at full budgets, and a whole frame with them"""
+    import laser_defender
+    try:
+        from particles import ParticleSystem, FIRE
+    except ImportError:
+        return {}
+
+    if laser_defender.screen is None:
+        laser_defender.bootstrap()
+    screen = laser_defender.screen
+    results = {}
+    for count in PARTICLE_COUNTS:
+        system = ParticleSystem(budget=count, seed=0)
+
+        def fill():
+            # Long-lived, slow particles in mid-screen, so none die during a repeat
+            system.clear()
+            while system.count < count:
+                system.emit(WIDTH / 2, HEIGHT / 3, 500, speed=1, life=10000, color=FIRE)
+        results[f"particles/update/{count}"] = measure(system.update, setup=fill, number=20)
+        results[f"particles/draw/pixels/{count}"] = measure(lambda: system.draw(screen, 0.5), setup=fill, number=20)
+        results[f"particles/draw/blits/{count}"] = measure(lambda: system.draw(screen, 0.5, 'blits'),
+                                                           setup=fill, number=5)
+        results[f"particles/explosion/{count}"] = measure(lambda: system.explosion(300, 300), setup=fill, number=50)
+
+        def frame():
+            system.update()
+            laser_defender.draw()
+            laser_defender.renderer.present()
+
+        def setup():
+            populate(laser_defender.state, 100)
+            fill()
+        laser_defender.particle_system = system
+        results[f"draw/particles/{count}"] = measure(frame, setup=setup, number=20)
+        laser_defender.particle_system = None
+    return results
+
+
+def bench_capture(quick):
+    """Reading a drawn frame back: a tostring copy against FrameCapture"""
+    import laser_defender
+    try:
+        from capture import FrameCapture
+    except ImportError:
+        return {}
+
+    if laser_defender.screen is None:
+        laser_defender.bootstrap()
+    screen = laser_defender.screen
+    populate(laser_defender.state, 100)
+    laser_defender.draw()
+    results = {"capture/tostring": measure(lambda: pygame.image.tostring(screen, 'RGB'), number=50)}
+    captures = [
+        ('rgb', FrameCapture(screen)),
+        ('gray', FrameCapture(screen, grayscale=True)),
+        ('gray_scale4_stack4', FrameCapture(screen, grayscale=True, scale=4, stack=4)),
+        ('gray_smooth4_stack4', FrameCapture(screen, grayscale=True, scale=4, stack=4, smooth=True)),
+    ]
+    for name, capture in captures:
+        results[f"capture/{name}"] = measure(capture.capture, number=50)
+    return results
+
+
+def bench_audio(quick):
+    import audio
+    import laser_defender
+
+    if pygame.mixer.get_init() is None:
+        pygame.mixer.init()
+    results = {}
+
+    def clear_memory():
+        audio.pcm_bytes.cache_clear()
+        audio._make_sound.cache_clear()
+
+    def clear_all():
+        clear_memory()
+        shutil.rmtree(audio.SOUND_CACHE_DIR, ignore_errors=True)
+
+    # create_sound_effects() reports progress with print()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["create_sound_effects/cold"] = measure(
+            laser_defender.create_sound_effects, setup=clear_all, number=1, repeat=3 if quick else 5)
+        results["create_sound_effects/disk_cache"] = measure(
+            laser_defender.create_sound_effects, setup=clear_memory, number=1, repeat=3 if quick else 5)
+        results["create_sound_effects/memory_cache"] = measure(laser_defender.create_sound_effects, number=100)
+    return results
+
+
+def make_history(path, size, seed=0):
+    """Write a history database of ``size`` random games straight through SQLite"""
+    from high_scores import SCHEMA
+
+    rng = random.Random(seed)
+    scores = [rng.randint(0, 200) for _ in range(size)]
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO games (id, score, player, date, laser_style) VALUES (?, ?, 'Player', '2024-01-01 00:00', 1)",
+            enumerate(scores, 1))
+        counts = {}
+        for score in scores:
+            counts[score] = counts.get(score, 0) + 1
+        conn.executemany("INSERT INTO score_counts (score, games) VALUES (?, ?)", counts.items())
+    conn.close()
+
+
+def bench_high_scores(quick):
+    from high_scores import HighScoreManager
+
+    results = {}
+    sizes = HISTORY_SIZES[:-1] if quick else HISTORY_SIZES
+    for size in sizes:
+        path = f"history-{size}.db"
+        make_history(path, size)
+        json_path = f"high_scores-{size}.json"
+
+        def startup():
+            HighScoreManager(path, json_path).close()
+        results[f"high_scores/startup/{size}"] = measure(startup, number=1, repeat=5)
+
+        manager = HighScoreManager(path, json_path)
+        results[f"high_scores/load_high_scores/{size}"] = measure(manager.load_high_scores, number=5)
+        rng = random.Random(size)
+        results[f"high_scores/add_score/{size}"] = measure(lambda: manager.add_score(rng.randint(0, 200)), number=200)
+        manager.close()
+    return results
+
+
+def _contention_writer(path, json_path, games, seed, start):
+    from high_scores import HighScoreManager
+
+    manager = HighScoreManager(path, json_path)
+    rng = random.Random(seed)
+    start.wait()
+    for _ in range(games):
+        manager.add_score(rng.randint(0, 200))
+        manager.history.flush()  # One transaction per game, like a cabinet
+    manager.close()
+
+
+def contention(writers, games, path):
+    """``writers`` processes each record ``games`` games in one history at once
+
+    Returns the seconds from start to the last commit. Raises if a game is
+    lost or a reader that only refreshes doesn't see every game.
+    """
+    from high_scores import HighScoreManager
+
+    json_path = path + ".json"
+    for stale in (path, path + "-wal", path + "-shm", json_path):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(stale)
+    HighScoreManager(path, json_path).close()
+    start = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=_contention_writer, args=(path, json_path, games, i, start))
+                 for i in range(writers)]
+    for process in processes:
+        process.start()
+    reader = HighScoreManager(path, json_path)
+    began = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - began
+    reader.refresh()
+    expected = writers * games
+    conn = sqlite3.connect(path)
+    stored, counted = conn.execute("SELECT (SELECT COUNT(*) FROM games), (SELECT SUM(games) FROM score_counts)").fetchone()
+    conn.close()
+    reader.close()
+    if not stored == counted == reader.index.total == expected:
+        raise RuntimeError(f"lost updates: {expected} games recorded, {stored} stored, "
+                           f"{counted} in the histogram, {reader.index.total} seen by a reader")
+    return elapsed
+
+
+def bench_leaderboard(quick):
+    """Dozens of game processes recording into one shared history"""
+    results = {}
+    games = 10 if quick else 25
+    for writers in ((8, 24) if quick else (8, 32, 64)):
+        results[f"high_scores/contention/{writers}x{games}"] = measure(
+            lambda: contention(writers, games, f"contention-{writers}.db"), number=1, repeat=3)
+    return results
+
+
+# (name, suite, prefixes of the benchmark names it produces)
+SUITES = [
+    ('startup', bench_startup, ('startup/',)),
+    ('update', bench_update, ('update/', 'collide/', 'collide_overlap/', 'narrowphase/')),
+    ('replay', bench_replay, ('replay/',)),
+    ('vector_env', bench_vector_env, ('vector_env/',)),
+    ('spectator', bench_spectator, ('spectator/',)),
+    ('pipeline', bench_pipeline, ('pipeline/',)),
+    ('render', bench_render, ('draw_laser/', 'draw/', 'draw_high_score_screen/')),
+    ('particles', bench_particles, ('particles/', 'draw/particles/')),
+    ('capture', bench_capture, ('capture/',)),
+    ('audio', bench_audio, ('create_sound_effects/',)),
+    ('high_scores', bench_high_scores, ('high_scores/startup/', 'high_scores/load_high_scores/',
+                                        'high_scores/add_score/')),
+    ('leaderboard', bench_leaderboard, ('high_scores/contention/',)),
+]
+
+
+def may_match(prefixes, pattern):
+    """Whether ``pattern`` can match a name starting with one of ``prefixes``
+
+    Only the pattern's literal start (up to its first wildcard) is compared,
+    so this errs on the side of running a suite.
+    """
+    literal = pattern
+    for wildcard in '*?[':
+        literal = literal.split(wildcard, 1)[0]
+    return any(prefix.startswith(literal) or literal.startswith(prefix) for prefix in prefixes)
+
+
+def run(only=None, quick=False):
+    results = {}
+    for name, suite, prefixes in SUITES:
+        if only is not None and not may_match(prefixes, only):
+            continue  # Nothing in this suite could match, so don't run it
+        for key, value in suite(quick).items():
+            if only is None or fnmatch.fnmatch(key, only):
+                results[key] = value
+                print(f"{key:<45} {value['median_ms']:>10.4f} ms  (best {value['min_ms']:.4f})")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print the change against a baseline and return the regressed names"""
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in sorted(current['results'].items()):
+        base = baseline['results'].get(key)
+        if base is None:
+            print(f"{key:<45} {'-':>10} {result['median_ms']:>10.4f}      new")
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<45} {base['median_ms']:>10.4f} {result['median_ms']:>10.4f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laser Defender benchmarks")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2)")
+    parser.add_argument("--only", metavar="PATTERN", help="only run and keep benchmarks matching this glob")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and smaller histories")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Run in a scratch directory so high scores and caches stay separate
+    with tempfile.TemporaryDirectory(prefix="laser-defender-bench-") as scratch:
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            current = run(args.only, args.quick)
+        finally:
+            # Pending high score writes must land in the scratch directory
+            manager = getattr(sys.modules.get('laser_defender'), 'high_score_manager', None)
+            if manager is not None:
+                manager.close()
+            os.chdir(cwd)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {output}")
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Pixel observations of the game screen as NumPy arrays.
+
+``FrameCapture`` reads a surface through ``pygame.surfarray.pixels3d``,
+which is a view of the surface's own memory, not a copy like
+``pygame.image.tostring``. Optional downscaling is done by pygame into a
+small surface that is reused between frames. Grayscale conversion and
+frame stacking write into preallocated buffers, so steady-state capture
+allocates nothing the size of a frame. Works with any video driver,
+including ``SDL_VIDEODRIVER=dummy``.
+
+Frames are returned as (height, width) or (height, width, 3) uint8 arrays,
+and stacks as (stack, height, width[, 3]) with the oldest frame first.
+"""
+import numpy as np
+import pygame
+
+
+class FrameCapture:
+    """Capture ``surface`` after each draw into reused NumPy buffers
+
+    ``scale`` divides the width and height (``smooth`` averages pixels,
+    otherwise nearest neighbour). ``stack`` keeps the last frames together,
+    as pixel-based agents usually want.
+    """
+
+    def __init__(self, surface, grayscale=False, scale=1, stack=1, smooth=False):
+        self.surface = surface
+        self.grayscale = grayscale
+        self.stack = stack
+        self.smooth = smooth
+        width, height = surface.get_size()
+        self.size = (width // scale, height // scale)
+        self._small = pygame.Surface(self.size, 0, surface) if scale > 1 else None
+
+        shape = (self.size[1], self.size[0]) if grayscale else (self.size[1], self.size[0], 3)
+        # Each frame is written twice, at i and i + stack, so the last
+        # ``stack`` frames are always one contiguous, in-order slice
+        self._frames = np.zeros((2 * stack if stack > 1 else 1,) + shape, dtype=np.uint8)
+        if grayscale:
+            self._sum = np.empty(shape, dtype=np.uint16)
+            self._term = np.empty(shape, dtype=np.uint16)
+        self.count = 0
+
+    def reset(self):
+        """Forget earlier frames (e.g. at the start of a new game)"""
+        self._frames[:] = 0
+        self.count = 0
+
+    def pixels(self):
+        """Zero-copy (height, width, 3) view of the source, downscaled if set
+
+        The surface stays locked, and can't be drawn on, until the view is
+        released.
+        """
+        source = self.surface
+        if self._small is not None:
+            scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+            scale(source, self.size, self._small)
+            source = self._small
+        return pygame.surfarray.pixels3d(source).transpose(1, 0, 2)
+
+    def capture(self):
+        """Read the current frame; returns the frame or the frame stack
+
+        The result is a view of an internal buffer that the next capture
+        overwrites.
+        """
+        stack = self.stack
+        slot = self.count % stack if stack > 1 else 0
+        frame = self._frames[slot]
+        rgb = self.pixels()
+        if self.grayscale:
+            # ITU-R BT.601 luma in 8.8 fixed point
+            total = self._sum
+            term = self._term
+            np.multiply(rgb[..., 0], 77, out=total, dtype=np.uint16)
+            np.multiply(rgb[..., 1], 150, out=term, dtype=np.uint16)
+            total += term
+            np.multiply(rgb[..., 2], 29, out=term, dtype=np.uint16)
+            total += term
+            np.right_shift(total, 8, out=frame, casting='unsafe')
+        else:
+            # Channel by channel: each copy then walks rows with a fixed stride
+            for channel in range(3):
+                frame[..., channel] = rgb[..., channel]
+        del rgb  # Unlock the surface
+        self.count += 1
+
+        if stack == 1:
+            return frame
+        self._frames[slot + stack] = frame
+        return self._frames[slot + 1:slot + 1 + stack]
@@ -0,0 +1,231 @@
+"""NumPy structure-of-arrays entity store for GameState.
+
+``ArrayGameState`` keeps laser and target positions in preallocated NumPy
+arrays instead of lists of ``pygame.Rect`` / ``[x, y]`` and does movement,
+off-screen culling and laser/target hit tests as batched array operations
+(a sweep-and-prune on x feeding a circle-vs-rect narrowphase).
+Removal compacts the arrays with one boolean mask per field, which keeps
+the survivors in spawn order. ``GameState`` keeps its lists in that order
+too, so ties (two lasers reaching a target at once, the lowest target for
+the autopilot) are broken the same way and both stores play identical
+games.
+
+NumPy is only needed when this module is used; the default ``GameState``
+stays pure Python.
+"""
+import numpy as np
+import pygame
+
+from game_state import GameState, HEIGHT, LASER_WIDTH, LASER_HEIGHT, TARGET_RADIUS
+
+
+class EntityArrays:
+    """Growable set of entities stored as one int32 array per field"""
+
+    def __init__(self, fields, capacity=64):
+        self.fields = fields
+        self.count = 0
+        self._data = {name: np.zeros(capacity, dtype=np.int32) for name in fields}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        """Live view of one field, trimmed to the current count"""
+        return self._data[name][:self.count]
+
+    def append(self, *values):
+        if self.count == len(self._data[self.fields[0]]):
+            for name in self.fields:
+                self._data[name] = np.concatenate([self._data[name], np.zeros_like(self._data[name])])
+        for name, value in zip(self.fields, values):
+            self._data[name][self.count] = value
+        self.count += 1
+
+    def remove(self, dead):
+        """Remove the entities at the given indices, keeping the rest in order"""
+        if not len(dead):
+            return
+        keep = np.ones(self.count, dtype=bool)
+        keep[dead] = False
+        new_count = int(keep.sum())
+        for name in self.fields:
+            data = self._data[name]
+            data[:new_count] = data[:self.count][keep]
+        self.count = new_count
+
+    def clear(self):
+        self.count = 0
+
+
+class ArrayGameState(GameState):
+    """GameState whose lasers and targets live in NumPy arrays
+
+    ``lasers`` and ``targets`` are still available for drawing and scripted
+    players, but are built on demand from the arrays.
+    """
+
+    arrays = True
+
+    def clear_entities(self):
+        self.laser_arrays = EntityArrays(('x', 'y'))  # top-left corner
+        self.target_arrays = EntityArrays(('x', 'y'))  # centre
+
+    @property
+    def lasers(self):
+        return [pygame.Rect(x, y, LASER_WIDTH, LASER_HEIGHT)
+                for x, y in zip(self.laser_arrays['x'].tolist(), self.laser_arrays['y'].tolist())]
+
+    @property
+    def targets(self):
+        return [[x, y] for x, y in zip(self.target_arrays['x'].tolist(), self.target_arrays['y'].tolist())]
+
+    def add_laser(self, x, y):
+        self.laser_arrays.append(x, y)
+
+    def add_target(self, x, y):
+        self.target_arrays.append(x, y)
+
+    def update_lasers(self):
+        ys = self.laser_arrays['y']
+        ys -= self.laser_step
+        if not self.swept:
+            self.cull_lasers()
+
+    def cull_lasers(self):
+        self.laser_arrays.remove(np.flatnonzero(self.laser_arrays['y'] + LASER_HEIGHT < 0))
+
+    def update_targets(self, events):
+        ys = self.target_arrays['y']
+        ys += self.target_step
+        if not self.swept:
+            self.check_bottom(events)
+
+    def check_bottom(self, events):
+        ys = self.target_arrays['y']
+        if not self.game_over and len(ys) and ys.max() > HEIGHT:
+            self.game_over = True
+            events.append('game_over')
+
+    def candidate_pairs(self):
+        """Broadphase: (target, laser) index arrays of the pairs worth testing
+
+        Lasers are sorted by x; each target takes the run whose x extent can
+        reach its circle. Everything moves vertically, so the x order barely
+        changes between ticks and no pair is missed however far they move.
+        """
+        tx = self.target_arrays['x']
+        lx = self.laser_arrays['x']
+        order = np.argsort(lx, kind='stable')
+        sorted_x = lx[order]
+        lo = np.searchsorted(sorted_x, tx - TARGET_RADIUS - LASER_WIDTH, 'left')
+        hi = np.searchsorted(sorted_x, tx + TARGET_RADIUS, 'right')
+        counts = hi - lo
+        total = int(counts.sum())
+        self.pairs_tested = total
+        pair_target = np.repeat(np.arange(len(tx)), counts)
+        run_start = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        return pair_target, order[run_start + np.arange(total)]
+
+    def collide_swept(self, events):
+        """Sweep-and-prune on x, then a batched swept circle-vs-rect narrowphase"""
+        self.pairs_tested = 0
+        if not self.laser_arrays.count or not self.target_arrays.count:
+            return
+        pair_target, pair_laser = self.candidate_pairs()
+        if not len(pair_target):
+            return
+        tx = self.target_arrays['x']
+        ty = self.target_arrays['y']
+        lx = self.laser_arrays['x']
+        ly = self.laser_arrays['y']
+
+        # Same arithmetic as collision.swept_circle_rect(), and indices are
+        # in spawn order in both stores, so they settle pairs in the same order
+        reach = self.laser_step + self.target_step
+        px = tx[pair_target]
+        end = ty[pair_target]
+        start = end - reach
+        lpx = lx[pair_laser]
+        lpy = ly[pair_laser]
+        dx = px - np.clip(px, lpx, lpx + LASER_WIDTH)
+        room = TARGET_RADIUS * TARGET_RADIUS - dx * dx
+        h = np.sqrt(np.maximum(room, 0).astype(np.float64))
+        top = lpy - h
+        bottom = lpy + LASER_HEIGHT + h
+        hit = (room >= 0) & (start <= bottom) & (end >= top)
+        if not hit.any():
+            return
+        start_hit = start[hit]
+        top_hit = top[hit]
+        if reach > 0:
+            toi = np.where(start_hit < top_hit, (top_hit - start_hit) / reach, 0.0)
+        else:
+            toi = np.zeros(len(start_hit))
+
+        # Earliest impact first, as in GameState.collide_swept
+        hit_target = pair_target[hit]
+        hit_laser = pair_laser[hit]
+        ranking = np.lexsort((hit_laser, hit_target, toi))
+        used_targets = set()
+        used_lasers = set()
+        dead_targets = []
+        dead_lasers = []
+        hits = []
+        target_step = self.target_step
+        for impact, t, l in zip(toi[ranking].tolist(), hit_target[ranking].tolist(), hit_laser[ranking].tolist()):
+            if t in used_targets or l in used_lasers:
+                continue
+            used_targets.add(t)
+            used_lasers.add(l)
+            dead_targets.append(t)
+            dead_lasers.append(l)
+            hits.append((int(tx[t]), round(int(ty[t]) - (1 - impact) * target_step)))
+        self.hits = hits
+        self.target_arrays.remove(np.array(dead_targets, dtype=np.intp))
+        self.laser_arrays.remove(np.array(dead_lasers, dtype=np.intp))
+        events.extend(['hit'] * len(dead_targets))
+        self.score += len(dead_targets)
+
+    def collide_overlap(self, events):
+        """Sweep-and-prune on x, then a batched circle-vs-rect narrowphase"""
+        self.pairs_tested = 0
+        if not self.laser_arrays.count or not self.target_arrays.count:
+            return
+        pair_target, pair_laser = self.candidate_pairs()
+        if not len(pair_target):
+            return
+        tx = self.target_arrays['x']
+        ty = self.target_arrays['y']
+        lx = self.laser_arrays['x']
+        ly = self.laser_arrays['y']
+
+        # Narrowphase: closest point of each laser rect to the target centre
+        px = tx[pair_target]
+        py = ty[pair_target]
+        lpx = lx[pair_laser]
+        lpy = ly[pair_laser]
+        dx = px - np.clip(px, lpx, lpx + LASER_WIDTH)
+        dy = py - np.clip(py, lpy, lpy + LASER_HEIGHT)
+        hit = dx * dx + dy * dy <= TARGET_RADIUS * TARGET_RADIUS
+        if not hit.any():
+            return
+
+        # Each target takes the first laser still free, as in GameState.collide
+        hit_target = pair_target[hit]
+        hit_laser = pair_laser[hit]
+        ranking = np.lexsort((hit_laser, hit_target))
+        used = set()
+        dead_targets = []
+        dead_lasers = []
+        for t, l in zip(hit_target[ranking].tolist(), hit_laser[ranking].tolist()):
+            if l in used or (dead_targets and dead_targets[-1] == t):
+                continue
+            used.add(l)
+            dead_targets.append(t)
+            dead_lasers.append(l)
+        self.hits = list(zip(tx[dead_targets].tolist(), ty[dead_targets].tolist()))
+        self.target_arrays.remove(np.array(dead_targets, dtype=np.intp))
+        self.laser_arrays.remove(np.array(dead_lasers, dtype=np.intp))
+        events.extend(['hit'] * len(dead_targets))
+        self.score += len(dead_targets)
@@ -0,0 +1,352 @@
+"""Headless simulation core for Laser Defender.
+
+The game rules live here, independent of the window, the mixer and the
+frame clock. ``GameState.step()`` advances the game by one tick from a set
+of input bits and returns the events that happened (for sounds etc.), so the
+same code drives the real game, headless balance sweeps and CI checks.
+
+The game always advances in fixed ticks of ``TICK_MS``, whatever the frame
+rate; ``FixedTimestep`` turns real frame times into whole ticks for the
+front end. Speeds are in px per ``TICK_MS`` and scaled to the step, so
+headless runs can also use bigger steps (a lower tick rate). Collision is
+swept by default (see collision.py), so fast lasers don't pass through
+targets even then.
+"""
+import random
+import time
+
+import pygame
+
+from collision import SpatialHash, circle_rect_overlap, swept_circle_rect
+
+# Constants
+WIDTH, HEIGHT = 600, 800
+FPS = 60
+TICK_MS = 1000 / FPS  # Fixed simulation step
+MAX_CATCH_UP_TICKS = 5  # Per frame; beyond this the game slows down instead
+
+PADDLE_WIDTH, PADDLE_HEIGHT = 80, 20
+PADDLE_SPEED = 7
+LASER_WIDTH, LASER_HEIGHT = 8, 25  # Made wider and taller for better visibility
+TARGET_RADIUS = 20
+LASER_SPEED = 10
+TARGET_SPEED = 3
+SHOOT_DELAY = 300  # ms
+SPAWN_INTERVAL = 1000  # ms
+
+# Input bits passed to GameState.step()
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_SHOOT = 4
+
+
+class GameState:
+    """All mutable game state plus the rules that advance it
+
+    ``spawn_interval`` and ``shoot_delay`` (ms) default to the game's values
+    and can be lowered for balance sweeps and stress runs. ``swept=False``
+    selects the discrete overlap test that replays recorded before swept
+    collision need.
+    """
+
+    arrays = False  # Entity store, recorded in replays (see entity_store.py)
+
+    def __init__(self, seed=None, spawn_interval=SPAWN_INTERVAL, shoot_delay=SHOOT_DELAY, swept=True):
+        self.rng = random.Random()
+        self.spawn_interval = spawn_interval
+        self.shoot_delay = shoot_delay
+        self.swept = swept
+        self.broadphase = SpatialHash()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Start a new game; a fresh seed is drawn unless one is given"""
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng.seed(seed)
+
+        self.paddle = pygame.Rect(WIDTH // 2 - PADDLE_WIDTH // 2, HEIGHT - 50, PADDLE_WIDTH, PADDLE_HEIGHT)
+        self.prev_paddle_x = self.paddle.x  # Before the last tick, for interpolation
+        self.clear_entities()
+        self.score = 0
+        self.game_over = False
+        self.time = 0  # ms of simulated time
+        self.ticks = 0
+        self.last_shot_time = None
+        self.target_timer = 0
+        self.pairs_tested = 0  # narrowphase tests in the last collide()
+        self.hits = []  # (x, y) of the targets destroyed in the last tick
+        self.set_step(TICK_MS)
+
+    def clear_entities(self):
+        self.lasers = []
+        self.targets = []  # [x, y]
+
+    def spawn_target(self):
+        x = self.rng.randint(TARGET_RADIUS, WIDTH - TARGET_RADIUS)
+        self.add_target(x, 0)
+
+    def add_laser(self, x, y):
+        self.lasers.append(pygame.Rect(x, y, LASER_WIDTH, LASER_HEIGHT))
+
+    def add_target(self, x, y):
+        self.targets.append([x, y])  # [x, y]
+
+    def set_step(self, dt):
+        """Distances moved in a step of ``dt`` ms (whole px)"""
+        self.dt = dt
+        self.paddle_step = round(PADDLE_SPEED * dt / TICK_MS)
+        self.laser_step = round(LASER_SPEED * dt / TICK_MS)
+        self.target_step = round(TARGET_SPEED * dt / TICK_MS)
+
+    def step(self, inputs, dt):
+        """Advance the game by one tick of ``dt`` ms and return a list of events
+
+        ``inputs`` is a bitmask of INPUT_LEFT / INPUT_RIGHT / INPUT_SHOOT.
+        Events are the names of the sounds the front end should play.
+        """
+        events = []
+        self.hits = []
+        if self.game_over:
+            return events
+
+        if dt != self.dt:
+            self.set_step(dt)
+        self.time += dt
+        self.ticks += 1
+        self.update_paddle(inputs, events)
+        self.update_lasers()
+        self.update_spawner(dt)
+        self.update_targets(events)
+        self.collide(events)
+        return events
+
+    def update_paddle(self, inputs, events):
+        """Move the paddle and fire a laser if the cooldown allows"""
+        paddle = self.paddle
+        self.prev_paddle_x = paddle.x
+        if inputs & INPUT_LEFT and paddle.left > 0:
+            paddle.x -= self.paddle_step
+        if inputs & INPUT_RIGHT and paddle.right < WIDTH:
+            paddle.x += self.paddle_step
+
+        if inputs & INPUT_SHOOT and (self.last_shot_time is None or self.time - self.last_shot_time > self.shoot_delay):
+            self.add_laser(paddle.centerx - LASER_WIDTH // 2, paddle.top - LASER_HEIGHT)
+            self.last_shot_time = self.time
+            events.append('shoot')
+
+    def update_lasers(self):
+        """Move lasers up and drop the ones that left the screen
+
+        Swept collision drops them after collide() instead, as a laser can
+        hit a target on its way out.
+        """
+        step = self.laser_step
+        for laser in self.lasers:
+            laser.y -= step
+        if not self.swept:
+            self.cull_lasers()
+
+    def cull_lasers(self):
+        self.lasers[:] = [laser for laser in self.lasers if laser.bottom >= 0]
+
+    def update_spawner(self, dt):
+        self.target_timer += dt
+        if self.target_timer > self.spawn_interval:
+            self.spawn_target()
+            self.target_timer = 0
+
+    def update_targets(self, events):
+        """Move targets down; one reaching the bottom ends the game
+
+        With swept collision the bottom is checked after collide(), so a
+        target shot down during the tick can't end the game.
+        """
+        step = self.target_step
+        for target in self.targets:
+            target[1] += step
+        if not self.swept:
+            self.check_bottom(events)
+
+    def check_bottom(self, events):
+        if not self.game_over and any(ty > HEIGHT for tx, ty in self.targets):
+            self.game_over = True
+            events.append('game_over')
+
+    def collide(self, events):
+        if self.swept:
+            self.collide_swept(events)
+            self.cull_lasers()
+            self.check_bottom(events)
+        else:
+            self.collide_overlap(events)
+
+    def collide_swept(self, events):
+        """Remove each target together with the laser it met first during the tick
+
+        Pairs are settled in order of time of impact, so a laser takes the
+        first target it reaches and a target the first laser to reach it.
+        """
+        targets = self.targets
+        lasers = self.lasers
+        self.pairs_tested = 0
+        if not targets or not lasers:
+            return
+
+        # Relative to the lasers, targets moved down this far in the tick
+        reach = self.laser_step + self.target_step
+        radius = TARGET_RADIUS
+        broadphase = self.broadphase
+        broadphase.build(lasers)
+        pairs = 0
+        impacts = []
+        for t, (tx, ty) in enumerate(targets):
+            start = ty - reach
+            for i in broadphase.query(tx - radius, start - radius, tx + radius, ty + radius):
+                pairs += 1
+                toi = swept_circle_rect(tx, start, radius, reach, lasers[i])
+                if toi is not None:
+                    impacts.append((toi, t, i))
+        self.pairs_tested = pairs
+        if not impacts:
+            return
+
+        impacts.sort()
+        dead_targets = set()
+        dead_lasers = set()
+        for toi, t, i in impacts:
+            if t in dead_targets or i in dead_lasers:
+                continue
+            dead_targets.add(t)
+            dead_lasers.add(i)
+            tx, ty = targets[t]
+            events.append('hit')
+            self.hits.append((tx, round(ty - (1 - toi) * self.target_step)))  # Where it was hit
+            self.score += 1
+        targets[:] = [target for t, target in enumerate(targets) if t not in dead_targets]
+        lasers[:] = [laser for i, laser in enumerate(lasers) if i not in dead_lasers]
+
+    def collide_overlap(self, events):
+        """Remove each target together with the first laser touching it"""
+        targets = self.targets
+        lasers = self.lasers
+        self.pairs_tested = 0
+        if not targets or not lasers:
+            return
+
+        broadphase = self.broadphase
+        broadphase.build(lasers)
+        pairs = 0
+        dead = set()
+        survivors = []
+        for target in targets:
+            tx, ty = target
+            for i in broadphase.query(tx - TARGET_RADIUS, ty - TARGET_RADIUS, tx + TARGET_RADIUS, ty + TARGET_RADIUS):
+                if i in dead:
+                    continue
+                pairs += 1
+                if circle_rect_overlap(tx, ty, TARGET_RADIUS, lasers[i]):
+                    dead.add(i)
+                    events.append('hit')
+                    self.hits.append((tx, ty))
+                    self.score += 1
+                    break
+            else:
+                survivors.append(target)
+        self.pairs_tested = pairs
+
+        if dead:
+            targets[:] = survivors
+            lasers[:] = [laser for i, laser in enumerate(lasers) if i not in dead]
+
+
+class FixedTimestep:
+    """Accumulates real frame time and hands it out as fixed simulation ticks
+
+    ``advance(ms)`` returns how many ticks of ``tick_ms`` to run for a frame
+    that took ``ms`` (times ``speed``, for fast-forward). At most
+    ``max_ticks * speed`` ticks are returned; time beyond that is dropped, so
+    an overloaded machine runs the game slower rather than falling further
+    and further behind. ``alpha`` is how far into the next tick the
+    accumulator is (0..1), for interpolating between the last two ticks.
+    """
+
+    def __init__(self, tick_ms=TICK_MS, max_ticks=MAX_CATCH_UP_TICKS, speed=1):
+        self.tick_ms = tick_ms
+        self.max_ticks = max_ticks
+        self.speed = speed
+        self.accumulator = 0.0
+        self.dropped_ticks = 0
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, ms):
+        self.accumulator += ms * self.speed
+        ticks = int(self.accumulator // self.tick_ms)
+        limit = self.max_ticks * self.speed
+        if ticks > limit:
+            self.dropped_ticks += ticks - limit
+            ticks = limit
+            self.accumulator %= self.tick_ms
+        else:
+            self.accumulator -= ticks * self.tick_ms
+        return ticks
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.tick_ms
+
+
+def autopilot(state):
+    """Simple scripted player: chase the lowest target and keep firing"""
+    inputs = INPUT_SHOOT
+    if state.targets:
+        tx = max(state.targets, key=lambda t: t[1])[0]
+        if tx < state.paddle.centerx - PADDLE_SPEED:
+            inputs |= INPUT_LEFT
+        elif tx > state.paddle.centerx + PADDLE_SPEED:
+            inputs |= INPUT_RIGHT
+    return inputs
+
+
+def run_headless(seed, max_ticks, policy=autopilot, dt=TICK_MS, state_class=GameState, **options):
+    """Play one game without a window and return the finished state"""
+    state = state_class(seed, **options)
+    while not state.game_over and state.ticks < max_ticks:
+        state.step(policy(state), dt)
+    return state
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run Laser Defender headless and report throughput")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--max-ticks", type=int, default=100000)
+    parser.add_argument("--spawn-interval", type=int, default=SPAWN_INTERVAL, help="ms between targets")
+    parser.add_argument("--shoot-delay", type=int, default=SHOOT_DELAY, help="ms between shots")
+    parser.add_argument("--arrays", action="store_true", help="use the NumPy entity store")
+    parser.add_argument("--tick-rate", type=int, default=FPS,
+                        help="ticks per game second (default %(default)s); lower is cheaper")
+    parser.add_argument("--discrete", action="store_true",
+                        help="discrete overlap collision instead of swept (tunnels at low tick rates)")
+    args = parser.parse_args()
+
+    state_class = GameState
+    if args.arrays:
+        from entity_store import ArrayGameState
+        state_class = ArrayGameState
+
+    total_ticks = 0
+    start = time.perf_counter()
+    for game in range(args.games):
+        state = run_headless(args.seed + game, args.max_ticks, dt=1000 / args.tick_rate, state_class=state_class,
+                             spawn_interval=args.spawn_interval, shoot_delay=args.shoot_delay,
+                             swept=not args.discrete)
+        total_ticks += state.ticks
+        print(f"seed {state.seed}: score {state.score} in {state.ticks} ticks")
+    elapsed = time.perf_counter() - start
+    print(f"{total_ticks} ticks in {elapsed:.2f}s ({total_ticks / elapsed:,.0f} ticks/s)")
@@ -0,0 +1,104 @@
+"""Adaptive quality: trade visual detail for frame time on slow machines.
+
+``QualityGovernor`` watches how long each frame spends working (not
+waiting on the frame cap) and moves between ``QUALITY_LEVELS``. It drops a
+level when the 90th percentile of a window of frames comes close to the
+frame budget. It raises one only after several windows in a row with
+plenty of headroom. The gap between the two thresholds, the patience, and
+starting a fresh window after every change keep it from flapping.
+"""
+from game_state import FPS
+
+# Cheapest last. hud_interval: frames between HUD text rebuilds;
+# interpolate: draw between simulation ticks; overlay_alpha: blend the
+# high score screen over the game instead of drawing it opaque;
+# dirty_rects: allow the dirty-rectangle renderer (its text repairs redraw
+# sprites, which costs more than a full redraw in dense waves);
+# particles: particle budget for hit and game-over effects
+QUALITY_LEVELS = (
+    {'name': 'high', 'hud_interval': 1, 'interpolate': True, 'overlay_alpha': True, 'dirty_rects': True,
+     'particles': 10000},
+    {'name': 'medium', 'hud_interval': 4, 'interpolate': True, 'overlay_alpha': True, 'dirty_rects': True,
+     'particles': 4000},
+    {'name': 'low', 'hud_interval': 8, 'interpolate': True, 'overlay_alpha': False, 'dirty_rects': False,
+     'particles': 1000},
+    {'name': 'minimal', 'hud_interval': 15, 'interpolate': False, 'overlay_alpha': False, 'dirty_rects': False,
+     'particles': 0},
+)
+QUALITY_NAMES = [level['name'] for level in QUALITY_LEVELS]
+
+
+class QualityGovernor:
+    """Picks a quality level from recent frame times; ``adaptive=False`` pins ``level``"""
+
+    def __init__(self, budget_ms=1000 / FPS, window=30, high_water=0.9, low_water=0.5, patience=4,
+                 level=0, adaptive=True):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.high_water = high_water
+        self.low_water = low_water
+        self.patience = patience
+        self.level = level
+        self.adaptive = adaptive
+        self.frames = 0
+        self.throttled_frames = 0  # Frames drawn below the top level
+        self.changes = 0
+        self.lowest = level
+        self.last_p90_ms = 0.0
+        self._times = []
+        self._calm_windows = 0
+
+    @property
+    def settings(self):
+        return QUALITY_LEVELS[self.level]
+
+    @property
+    def name(self):
+        return QUALITY_LEVELS[self.level]['name']
+
+    def record(self, busy_ms):
+        """Add one frame's working time; returns True if the level changed"""
+        self.frames += 1
+        if self.level:
+            self.throttled_frames += 1
+        if not self.adaptive:
+            return False
+        times = self._times
+        times.append(busy_ms)
+        if len(times) < self.window:
+            return False
+
+        times.sort()
+        p90 = self.last_p90_ms = times[int(len(times) * 0.9)]
+        times.clear()
+        if p90 > self.budget_ms * self.high_water and self.level < len(QUALITY_LEVELS) - 1:
+            self._calm_windows = 0
+            return self._set_level(self.level + 1)
+        if p90 < self.budget_ms * self.low_water and self.level > 0:
+            self._calm_windows += 1
+            if self._calm_windows >= self.patience:
+                self._calm_windows = 0
+                return self._set_level(self.level - 1)
+        else:
+            self._calm_windows = 0
+        return False
+
+    def _set_level(self, level):
+        direction = "lowered" if level > self.level else "raised"
+        self.level = level
+        self.lowest = max(self.lowest, level)
+        self.changes += 1
+        print(f"Quality {direction} to {self.name} (p90 frame work {self.last_p90_ms:.1f} ms, "
+              f"budget {self.budget_ms:.1f} ms)")
+        return True
+
+    def stats(self):
+        """Current level and how much of the time the game has been throttled"""
+        return {
+            'quality': self.name,
+            'level': self.level,
+            'lowest_quality': QUALITY_LEVELS[self.lowest]['name'],
+            'changes': self.changes,
+            'throttled_percent': 100 * self.throttled_frames / self.frames if self.frames else 0.0,
+            'p90_frame_ms': self.last_p90_ms,
+        }
@@ -0,0 +1,509 @@
+"""High scores backed by a full, append-only history of every game.
+
+Every finished game is appended to a SQLite database (``HISTORY_DB``)
+together with a per-score histogram that is updated in the same
+transaction. Start-up only reads that histogram and the top
+``MAX_HIGH_SCORES`` rows through an index, never the whole history, so it
+stays fast however many games a cabinet has logged. In memory:
+
+- ``ScoreIndex`` holds the histogram as sorted distinct scores plus a
+  Fenwick tree of counts: rank and percentile queries are a bisect and an
+  O(log n) walk, and adding a game is O(log n) unless its score is new.
+- The top-N table is a size-N min-heap that each new game is pushed into.
+
+Writes go through a background thread, so the frame loop never waits on
+disk. ``high_scores.json`` is still written (atomically, see
+persistence.py) with the top-N table for tools that read it, and is
+imported once if the database is empty.
+
+A game can come with a replay (see replay.py). The writer thread saves it
+as ``REPLAY_DIR/<id>.ldr`` before committing the game's row, whose
+``replay`` column names the file, so ``replay.py verify`` can re-simulate
+every recorded game and compare the scores.
+
+Several game processes can share one history. The database is in WAL
+mode, so readers never block the writer. Each writer transaction starts
+with ``BEGIN IMMEDIATE``, so writers queue on the lock (up to
+``BUSY_TIMEOUT``) instead of failing. Game ids come from SQLite, so they
+never collide. ``HighScoreManager.refresh()`` merges in games other
+processes have committed. It reads only the rows after the last one seen,
+and costs nothing when ``PRAGMA data_version`` shows no other commits. It
+runs on the frame loop, so it never waits for a busy database: the games
+are merged on a later call instead.
+"""
+import bisect
+import heapq
+import itertools
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+from persistence import BackgroundWriter, atomic_write
+
+HIGH_SCORE_FILE = "high_scores.json"
+HISTORY_DB = "game_history.db"
+MAX_HIGH_SCORES = 10
+REPLAY_DIR = "replays"
+BUSY_TIMEOUT = 30  # Seconds a process waits for another's write to finish
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    date TEXT NOT NULL,
+    laser_style INTEGER NOT NULL,
+    replay TEXT
+);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (score DESC, id);
+CREATE TABLE IF NOT EXISTS score_counts (
+    score INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+GAME_COLUMNS = ('id', 'score', 'player', 'date', 'laser_style')
+
+
+class ScoreIndex:
+    """Multiset of scores with O(log n) rank and percentile queries"""
+
+    def __init__(self, counts=()):
+        pairs = sorted(counts)
+        self.values = [score for score, n in pairs]
+        self.counts = [n for score, n in pairs]
+        self.total = sum(self.counts)
+        self.points = sum(score * n for score, n in pairs)
+        self._build()
+
+    def _build(self):
+        # Fenwick tree over self.counts, built in O(k)
+        tree = [0] + self.counts
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, score, n=1):
+        self.total += n
+        self.points += score * n
+        i = bisect.bisect_left(self.values, score)
+        if i < len(self.values) and self.values[i] == score:
+            self.counts[i] += n
+            i += 1
+            while i < len(self._tree):
+                self._tree[i] += n
+                i += i & -i
+        else:
+            # A score never seen before: rare once scores settle, so rebuild
+            self.values.insert(i, score)
+            self.counts.insert(i, n)
+            self._build()
+
+    def count_at_most(self, score):
+        i = bisect.bisect_right(self.values, score)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def rank(self, score):
+        """1-based position a score would take among all games (ties share)"""
+        return self.total - self.count_at_most(score) + 1
+
+    def kth_smallest(self, k):
+        """Score of the k-th lowest game (1-based)"""
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return self.values[pos]
+
+    def percentile(self, p):
+        """Nearest-rank percentile (0-100) of all scores"""
+        if not self.total:
+            return 0
+        return self.kth_smallest(max(1, math.ceil(p / 100 * self.total)))
+
+    def best(self):
+        return self.values[-1] if self.values else 0
+
+
+class GameHistory:
+    """SQLite game log; appends are queued and written by a background thread"""
+
+    def __init__(self, path=HISTORY_DB, replay_dir=REPLAY_DIR):
+        self.path = path
+        self.replay_dir = replay_dir
+        self.own_ids = set()  # Games this process committed that refresh() hasn't seen
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.migrate(self._conn)
+        self._data_version = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"history:{path}", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def migrate(conn):
+        """Bring a database from an older version up to SCHEMA"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(games)")]
+        if 'replay' not in columns:
+            try:
+                conn.execute("ALTER TABLE games ADD COLUMN replay TEXT")
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                if 'duplicate column' not in str(e):  # Another process migrated first
+                    raise
+
+    def load(self, n):
+        """Score histogram, n best games, last game id and clear count, from one snapshot"""
+        conn = self._conn
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        conn.execute("BEGIN")
+        try:
+            score_counts = conn.execute("SELECT score, games FROM score_counts").fetchall()
+            top = self.top(n)
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM games").fetchone()[0]
+            clears = self._clears()
+        finally:
+            conn.execute("COMMIT")
+        return score_counts, top, last_id, clears
+
+    def _clears(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'clears'").fetchone()
+        return row[0] if row else 0
+
+    def top(self, n):
+        """The n best games, best first (earlier game first on ties)"""
+        rows = self._conn.execute(
+            "SELECT id, score, player, date, laser_style FROM games ORDER BY score DESC, id LIMIT ?", (n,)
+        ).fetchall()
+        return [dict(zip(GAME_COLUMNS, row)) for row in rows]
+
+    def poll(self, after_id):
+        """(clear count, games after ``after_id``), or None if nothing was committed since the last look
+
+        Also None, without waiting, while another process holds the
+        database busy; the same games are returned by a later poll.
+        """
+        conn = self._conn
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return None
+            conn.execute("BEGIN")
+            try:
+                clears = self._clears()
+                rows = conn.execute(
+                    "SELECT id, score, player, date, laser_style FROM games WHERE id > ? ORDER BY id", (after_id,)
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                return None
+            raise
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}")
+        self._data_version = version
+        return clears, [dict(zip(GAME_COLUMNS, row)) for row in rows]
+
+    def append(self, entry, replay=None):
+        """Queue a game (a dict with score, player, date, laser_style)
+
+        Its ``id`` is filled in once committed. ``replay`` is the encoded
+        replay (bytes), saved next to the history.
+        """
+        self._queue.put(('append', entry, replay))
+
+    def import_entries(self, entries):
+        """Queue games to add only if the history is still empty"""
+        self._queue.put(('import', entries, None))
+
+    def clear(self):
+        self._queue.put(('clear', None, None))
+
+    def flush(self):
+        """Block until every queued change is committed"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._conn.close()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                # Commit everything already queued in one transaction
+                while item is not None:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                self._commit(conn, [change for change in batch if change is not None])
+                for change in batch:
+                    self._queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn, changes):
+        if not changes:
+            return
+        added = []  # (entry, id) of each game inserted
+        try:
+            # Take the write lock up front, so other processes wait for it
+            # instead of failing to upgrade a read lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for change in changes:
+                    self._apply(conn, *change, added)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self.own_ids.difference_update(game_id for _, game_id in added)
+            print(f"Error saving game history: {e}")
+            return
+        for entry, game_id in added:
+            entry['id'] = game_id
+
+    def _insert(self, conn, entry, replay, added):
+        # Ids keep counting up across clears, so refresh() can read "after id N"
+        game_id = conn.execute(
+            "INSERT INTO games (id, score, player, date, laser_style) VALUES ("
+            "MAX(COALESCE((SELECT MAX(id) FROM games), 0), "
+            "COALESCE((SELECT value FROM meta WHERE key = 'last_id'), 0)) + 1, ?, ?, ?, ?)",
+            (entry['score'], entry['player'], entry['date'], entry['laser_style']),
+        ).lastrowid
+        # Before the commit makes the row visible to refresh()
+        self.own_ids.add(game_id)
+        added.append((entry, game_id))
+        if replay is not None:
+            try:
+                os.makedirs(self.replay_dir, exist_ok=True)
+                replay_path = os.path.join(self.replay_dir, f"{game_id}.ldr")
+                atomic_write(replay_path, replay)
+                conn.execute("UPDATE games SET replay = ? WHERE id = ?", (replay_path, game_id))
+            except OSError as e:
+                print(f"Error saving replay: {e}")
+        conn.execute(
+            "INSERT INTO score_counts (score, games) VALUES (?, 1) "
+            "ON CONFLICT (score) DO UPDATE SET games = games + 1",
+            (entry['score'],),
+        )
+
+    def _apply(self, conn, action, entry, replay, added):
+        if action == 'append':
+            self._insert(conn, entry, replay, added)
+        elif action == 'import':
+            if conn.execute("SELECT EXISTS (SELECT 1 FROM games)").fetchone()[0]:
+                return  # Another process got there first
+            for game in entry:
+                self._insert(conn, game, None, added)
+        elif action == 'clear':
+            for (path,) in conn.execute("SELECT replay FROM games WHERE replay IS NOT NULL").fetchall():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            conn.execute("INSERT INTO meta (key, value) SELECT 'last_id', COALESCE(MAX(id), 0) FROM games WHERE true "
+                         "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)")
+            conn.execute("DELETE FROM games")
+            conn.execute("DELETE FROM score_counts")
+            conn.execute("INSERT INTO meta (key, value) VALUES ('clears', 1) "
+                         "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+
+class HighScoreManager:
+    def __init__(self, history_path=HISTORY_DB, json_path=HIGH_SCORE_FILE, replay_dir=REPLAY_DIR):
+        self.high_scores = []
+        self.version = 0  # Bumped whenever high_scores or the statistics change
+        self.json_path = json_path
+        # Saves happen on background threads so the frame loop never waits on disk
+        self.writer = BackgroundWriter(json_path)
+        self.history = GameHistory(history_path, replay_dir)
+        self._seq = itertools.count()
+        self.load_high_scores()
+
+    def load_high_scores(self):
+        """Load the score histogram and the top scores from the history"""
+        score_counts, top, last_id, self._clears = self.history.load(MAX_HIGH_SCORES)
+        if not last_id and not self._clears and self._import_legacy_json():
+            score_counts, top, last_id, self._clears = self.history.load(MAX_HIGH_SCORES)
+        self.index = ScoreIndex(score_counts)
+        self._seen_id = last_id
+        self.history.own_ids.difference_update([game_id for game_id in list(self.history.own_ids)
+                                                if game_id <= last_id])
+        # Min-heap of (score, -order, -seq, entry): the root is the entry to
+        # evict next. order is the game id, or for games of this process not
+        # yet committed, just after the last id seen; seq breaks the
+        # remaining ties, so entries themselves are never compared.
+        self._heap = [self._heap_item(entry, entry['id']) for entry in top if entry['score'] > 0]
+        heapq.heapify(self._heap)
+        self._refresh_table()
+
+    def _heap_item(self, entry, order):
+        return (entry['score'], -order, -next(self._seq), entry)
+
+    def _push(self, item):
+        """Offer an item to the top-N heap; True if it made the table"""
+        if len(self._heap) < MAX_HIGH_SCORES:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+        else:
+            return False
+        return True
+
+    def _import_legacy_json(self):
+        """Seed an empty history with the entries of an old high_scores.json"""
+        try:
+            if not os.path.exists(self.json_path):
+                return False
+            with open(self.json_path, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Error loading high scores: {e}")
+            return False
+        self.history.import_entries([{key: entry[key] for key in ('score', 'player', 'date', 'laser_style')}
+                                     for entry in entries])
+        self.history.flush()
+        return True
+
+    def refresh(self):
+        """Merge in games other processes have recorded; returns True if anything changed"""
+        changes = self.history.poll(self._seen_id)
+        if changes is None:
+            return False
+        clears, entries = changes
+        if clears != self._clears:
+            # Cleared by another process: start again from the database
+            self.load_high_scores()
+            return True
+        own_ids = self.history.own_ids
+        merged = False
+        for entry in entries:
+            self._seen_id = entry['id']
+            if entry['id'] in own_ids:
+                own_ids.discard(entry['id'])  # Counted when it was added
+                continue
+            self.index.add(entry['score'])
+            if entry['score'] > 0:
+                self._push(self._heap_item(entry, entry['id']))
+            merged = True
+        if merged:
+            self._refresh_table()
+        return merged
+
+    def _refresh_table(self):
+        self.high_scores = [entry for _, _, _, entry in sorted(self._heap, reverse=True)]
+        self.version += 1
+
+    def save_high_scores(self):
+        """Queue the top scores to be written to high_scores.json (atomically, in the background)"""
+        self.writer.submit([{key: entry[key] for key in ('score', 'player', 'date', 'laser_style')}
+                            for entry in self.high_scores])
+
+    def close(self):
+        """Write any pending scores and history before exiting"""
+        self.history.close()
+        self.writer.close()
+
+    def add_score(self, score, player_name="Player", laser_style=1, replay=None):
+        """Record a finished game (and its encoded replay) and return if it's a high score"""
+        # Merge other processes' games first, so the table saved to
+        # high_scores.json has them too
+        self.refresh()
+        entry = {
+            'id': None,  # Assigned by the database when the game is committed
+            'score': score,
+            'player': player_name,
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            'laser_style': laser_style
+        }
+        self.history.append(entry, replay)
+        self.index.add(score)
+        self.version += 1  # New totals for the statistics, even if not a high score
+
+        if score <= 0:
+            return False
+
+        # Check if this is a high score
+        if not self._push(self._heap_item(entry, self._seen_id + 0.5)):
+            return False
+
+        self._refresh_table()
+        self.save_high_scores()
+        return True
+
+    def get_top_score(self):
+        """Get the highest score"""
+        if self.high_scores:
+            return self.high_scores[0]['score']
+        return 0
+
+    def is_new_record(self, score):
+        """Check if score would be a new record"""
+        if not self.high_scores:
+            return True
+        return score > self.high_scores[0]['score']
+
+    def get_rank(self, score):
+        """Rank of a score among every game played (1 = best)"""
+        return self.index.rank(score)
+
+    def clear_all_scores(self):
+        """Clear all high scores"""
+        self.history.clear()
+        self._clears += 1
+        self.index = ScoreIndex()
+        self._heap = []
+        self._refresh_table()
+        self.save_high_scores()
+        print("All high scores cleared!")
+
+    def get_statistics(self):
+        """Get statistics over every game played"""
+        index = self.index
+        if not index.total:
+            return {
+                'total_games': 0,
+                'best_score': 0,
+                'average_score': 0,
+                'total_points': 0,
+                'median_score': 0,
+                'p90_score': 0
+            }
+
+        return {
+            'total_games': index.total,
+            'best_score': index.best(),
+            'average_score': index.points // index.total,
+            'total_points': index.points,
+            'median_score': index.percentile(50),
+            'p90_score': index.percentile(90)
+        }
@@ -0,0 +1,89 @@
+"""Input-to-flip latency: how long input takes to reach the screen.
+
+``InputLatency`` measures two things for every frame that shows new input.
+It times the frame from reading the keyboard to the flip. It also times
+each key press from its timestamp to the flip of the first frame that used
+it. A frame counts only when it shows a tick that ran on a fresh input
+sample, because that is when a press can first become visible. Frames
+interpolated between the last two ticks show the game up to a tick in the
+past, and that lag is added too.
+
+The key timestamps depend on the loop. ``--low-latency`` waits for the next
+frame inside ``pygame.event.wait()`` and stamps each key event the moment
+it arrives (pygame events carry no timestamp of their own). The default
+loop stamps events when the frame reads them, so their time in the queue
+isn't counted.
+"""
+import collections
+import time
+
+LATENCY_WINDOW = 600  # Frames and key presses kept for the percentiles (10 s)
+
+
+def _percentiles(values):
+    values = sorted(values)
+    return values[len(values) // 2], values[int(len(values) * 0.99)]
+
+
+class InputLatency:
+    """Rolling input-to-flip latencies in ms, per frame and per key press"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.frames = collections.deque(maxlen=window)
+        self.presses = collections.deque(maxlen=window)
+        self.total_presses = 0
+        self._pending = []  # Timestamps of key events not on screen yet
+        self._shown = None  # When the input of the last frame counted was read
+        self._line = ''
+        self._line_age = 0
+
+    def key_event(self, stamp):
+        """A game key went down or up at ``stamp`` (perf_counter seconds)"""
+        self._pending.append(stamp)
+
+    def flipped(self, sampled, behind_ms=0.0, now=None):
+        """A frame showing input read at ``sampled`` has been flipped
+
+        ``behind_ms`` is how far behind its newest tick the frame was drawn.
+        """
+        if sampled is None or sampled == self._shown:
+            return  # Nothing new on screen
+        if now is None:
+            now = time.perf_counter()
+        self._shown = sampled
+        self.frames.append((now - sampled) * 1000 + behind_ms)
+        if self._pending:
+            pending = []
+            for stamp in self._pending:
+                if stamp <= sampled:
+                    self.presses.append((now - stamp) * 1000 + behind_ms)
+                    self.total_presses += 1
+                else:
+                    pending.append(stamp)
+            self._pending = pending
+
+    def stats(self):
+        """p50 and p99 of the recent frames and key presses, in ms"""
+        stats = {'frames': len(self.frames), 'presses': self.total_presses}
+        if self.frames:
+            stats['frame_p50_ms'], stats['frame_p99_ms'] = _percentiles(self.frames)
+        if self.presses:
+            stats['press_p50_ms'], stats['press_p99_ms'] = _percentiles(self.presses)
+        return stats
+
+    def summary(self):
+        """One line for the overlay and the exit report"""
+        stats = self.stats()
+        if not self.frames:
+            return "Input to flip: no input yet"
+        text = f"Input to flip: frame p50 {stats['frame_p50_ms']:.1f} p99 {stats['frame_p99_ms']:.1f} ms"
+        if self.presses:
+            text += f", key p50 {stats['press_p50_ms']:.1f} p99 {stats['press_p99_ms']:.1f} ms"
+        return text
+
+    def overlay_line(self, refresh=30):
+        """``summary()``, rebuilt every ``refresh`` calls so the overlay text holds still"""
+        if self._line_age % refresh == 0:
+            self._line = self.summary()
+        self._line_age += 1
+        return self._line
@@ -1,17 +1,28 @@
-import pygame
-import random
 import sys
-import math
-import json
-import os
-from datetime import datetime
+import threading
+import time
+
+# Start of the start-up report, so it covers importing pygame and the game modules
+_import_start = time.perf_counter()
+
+import pygame
 
-# Initialize
-pygame.init()
+import audio
+import sprites
+from high_scores import HighScoreManager
+from governor import QualityGovernor, QUALITY_NAMES
+from input_latency import InputLatency
+from profiler import FrameProfiler, StartupTimer
+from replay import ReplayRecorder
+from renderers import FullRenderer, DirtyRectRenderer
+from sprites import SpriteAtlas
+from text_cache import TextCache
+from game_state import (
+    GameState, FixedTimestep, WIDTH, HEIGHT, FPS, TICK_MS,
+    LASER_SPEED, TARGET_SPEED, INPUT_LEFT, INPUT_RIGHT, INPUT_SHOOT,
+)
 
 # Constants
-WIDTH, HEIGHT = 600, 800
-FPS = 60
 WHITE = (255, 255, 255)
 RED = (255, 50, 50)
 BLUE = (50, 150, 255)
@@ -19,129 +30,52 @@ BLACK = (0, 0, 0)
 GREEN = (50, 255, 100)
 GOLD = (255, 215, 0)  # For high scores
 
-PADDLE_WIDTH, PADDLE_HEIGHT = 80, 20
-LASER_WIDTH, LASER_HEIGHT = 8, 25  # Made wider and taller for better visibility
-TARGET_RADIUS = 20
-LASER_SPEED = 10
-TARGET_SPEED = 3
-SHOOT_DELAY = 300  # ms
-
-# High Score System
-HIGH_SCORE_FILE = "high_scores.json"
-MAX_HIGH_SCORES = 10
-
-class HighScoreManager:
-    def __init__(self):
-        self.high_scores = []
-        self.load_high_scores()
-    
-    def load_high_scores(self):
-        """Load high scores from file"""
-        try:
-            if os.path.exists(HIGH_SCORE_FILE):
-                with open(HIGH_SCORE_FILE, 'r') as f:
-                    self.high_scores = json.load(f)
-                # Sort by score (highest first)
-                self.high_scores.sort(key=lambda x: x['score'], reverse=True)
-                # Keep only top scores
-                self.high_scores = self.high_scores[:MAX_HIGH_SCORES]
-            else:
-                self.high_scores = []
-        except Exception as e:
-            print(f"Error loading high scores: {e}")
-            self.high_scores = []
-    
-    def save_high_scores(self):
-        """Save high scores to file"""
-        try:
-            with open(HIGH_SCORE_FILE, 'w') as f:
-                json.dump(self.high_scores, f, indent=2)
-        except Exception as e:
-            print(f"Error saving high scores: {e}")
-    
-    def add_score(self, score, player_name="Player"):
-        """Add a new score and return if it's a high score"""
-        if score <= 0:
-            return False
-        
-        # Check if this is a high score
-        is_high_score = len(self.high_scores) < MAX_HIGH_SCORES or score > self.high_scores[-1]['score']
-        
-        if is_high_score:
-            new_score = {
-                'score': score,
-                'player': player_name,
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
-                'laser_style': LASER_STYLE
-            }
-            
-            self.high_scores.append(new_score)
-            # Sort by score (highest first)
-            self.high_scores.sort(key=lambda x: x['score'], reverse=True)
-            # Keep only top scores
-            self.high_scores = self.high_scores[:MAX_HIGH_SCORES]
-            
-            # Save to file
-            self.save_high_scores()
-            
-            return True
-        
-        return False
-    
-    def get_top_score(self):
-        """Get the highest score"""
-        if self.high_scores:
-            return self.high_scores[0]['score']
-        return 0
-    
-    def is_new_record(self, score):
-        """Check if score would be a new record"""
-        if not self.high_scores:
-            return True
-        return score > self.high_scores[0]['score']
-    
-    def clear_all_scores(self):
-        """Clear all high scores"""
-        self.high_scores = []
-        self.save_high_scores()
-        print("All high scores cleared!")
-    
-    def get_statistics(self):
-        """Get high score statistics"""
-        if not self.high_scores:
-            return {
-                'total_games': 0,
-                'best_score': 0,
-                'average_score': 0,
-                'total_points': 0
-            }
-        
-        total_points = sum(score['score'] for score in self.high_scores)
-        return {
-            'total_games': len(self.high_scores),
-            'best_score': self.high_scores[0]['score'],
-            'average_score': total_points // len(self.high_scores),
-            'total_points': total_points
-        }
-
-# Initialize high score manager
-high_score_manager = HighScoreManager()
-
-# Setup
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Laser Defender")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 36)
-
-# Player Paddle
-paddle = pygame.Rect(WIDTH // 2 - PADDLE_WIDTH // 2, HEIGHT - 50, PADDLE_WIDTH, PADDLE_HEIGHT)
-
-# Game state
-lasers = []
-targets = []
-score = 0
-last_shot_time = 0
-game_over = False
+# Window, fonts, renderer and high scores are created by bootstrap(), so
+# importing this module opens no window and touches no files
+high_score_manager = None
+screen = None
+clock = None
+font = None
+small_font = None
+renderer = None
+text_cache = TextCache()
+sprite_atlas = SpriteAtlas(GREEN, RED, BLUE)
+
+# Game state (paddle, lasers, targets, score)
+state = GameState()
+
+# Input of every tick of the current game, saved with it as a replay
+recorder = ReplayRecorder()
+
+# Live spectators (--spectate PORT); None when not streaming
+spectators = None
+
+# --pipelined: the game ticks on its own thread (a pipeline.Simulation,
+# created by main()) and frames draw its latest snapshot
+PIPELINED = False
+simulation = None
+
+# Frame profiler (F3: overlay, F4: export trace); idle until enabled
+profiler = FrameProfiler()
+
+# The simulation runs in fixed ticks; frames are drawn at RENDER_FPS (0 = uncapped)
+timestep = FixedTimestep()
+RENDER_FPS = FPS
+FAST_FORWARD_SPEED = 8  # F toggles this many ticks per real tick, without rendering
+FAST_FORWARD_PREVIEW_MS = 250  # One frame this often while fast-forwarding
+
+# Input-to-flip latency, shown with the profiler overlay. --low-latency
+# only lets these events through, waits for each frame in the event queue
+# (stamping key events as they arrive), latches taps of the fire key and
+# draws the latest tick instead of interpolating behind it
+input_latency = InputLatency()
+LOW_LATENCY = False
+LOW_LATENCY_EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP]
+GAME_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE)
+
+# Visual detail, lowered automatically when frames run over budget
+governor = QualityGovernor()
+DIRTY_RECTS = False  # Dirty-rectangle rendering asked for (used while quality allows)
 
 # Laser style: 1..5 (toggle in game with number keys)
 LASER_STYLE = 1
@@ -156,73 +90,12 @@ STYLE_NAMES = {
 
 # Sound effects
 def create_sound_effects():
-    """Create simple sound effects using pygame's built-in sound generation"""
+    """Create the shoot, hit and game over sounds (synthesized once, then cached)"""
     sounds = {}
     
     try:
-        # Create simple beep sounds using pygame's built-in capabilities
-        # We'll create very basic sounds that don't require numpy
-        
-        # For now, we'll use a simple approach - create empty sounds and mark them as available
-        # This will allow the game to run without numpy while still having sound structure
-        
-        print("Creating basic sound effects...")
-        
-        # Create a simple beep sound using pygame's built-in sound generation
-        sample_rate = 22050
-        duration = 100  # 100ms
-        
-        # Create a simple sine wave beep
-        samples = int(sample_rate * duration / 1000)
-        sound_data = []
-        
-        for i in range(samples):
-            # Simple sine wave at 800Hz
-            value = int(127 + 127 * math.sin(2 * math.pi * 800 * i / sample_rate))
-            sound_data.append(value)
-        
-        # Convert to pygame sound using a different approach
-        try:
-            # Try to create a simple sound buffer
-            import array
-            sound_buffer = array.array('h', sound_data)
-            shoot_sound = pygame.mixer.Sound(buffer=sound_buffer)
-            sounds['shoot'] = shoot_sound
-            print("Shoot sound created successfully")
-        except:
-            # Fallback: create a dummy sound
-            print("Using fallback sound system")
-            sounds['shoot'] = None
-        
-        # Create hit sound (lower frequency)
-        hit_data = []
-        for i in range(samples):
-            value = int(127 + 127 * math.sin(2 * math.pi * 400 * i / sample_rate))
-            hit_data.append(value)
-        
-        try:
-            hit_buffer = array.array('h', hit_data)
-            hit_sound = pygame.mixer.Sound(buffer=hit_buffer)
-            sounds['hit'] = hit_sound
-            print("Hit sound created successfully")
-        except:
-            sounds['hit'] = None
-        
-        # Create game over sound (descending tone)
-        game_over_data = []
-        for i in range(samples * 2):  # Longer duration
-            freq = 600 - (400 * i / (samples * 2))  # Descending frequency
-            value = int(127 + 127 * math.sin(2 * math.pi * freq * i / sample_rate))
-            game_over_data.append(value)
-        
-        try:
-            game_over_buffer = array.array('h', game_over_data)
-            game_over_sound = pygame.mixer.Sound(buffer=game_over_buffer)
-            sounds['game_over'] = game_over_sound
-            print("Game over sound created successfully")
-        except:
-            sounds['game_over'] = None
-        
+        for name in ('shoot', 'hit', 'game_over'):
+            sounds[name] = audio.make_sound(name)
         print("Sound effects initialization complete!")
         return sounds
         
@@ -238,9 +111,109 @@ def play_sound(sound_name):
         except:
             pass  # Silently fail if sound can't play
 
-# Initialize sounds
-sounds = create_sound_effects()
-SOUND_ENABLED = len(sounds) > 0
+# Sounds are built by warm_audio() on a background thread after the first frame
+sounds = {}
+SOUND_ENABLED = False
+audio_thread = None
+
+# Hit and game-over effects (a particles.ParticleSystem); created in the
+# background after the first frame, as numpy is slow to import
+particle_system = None
+PARTICLES = True  # --no-particles turns effects off
+
+def warm_audio():
+    """Open the mixer and build the sound effects and music"""
+    global sounds, SOUND_ENABLED
+    try:
+        if pygame.mixer.get_init() is None:
+            pygame.mixer.init()
+    except pygame.error as e:
+        print(f"Could not open audio device: {e}")
+        return
+    loaded = create_sound_effects()
+    if loaded:
+        try:
+            audio.make_sound('music')  # So the first M press starts it at once
+        except Exception as e:
+            print(f"Could not create background music: {e}")
+    sounds = loaded
+    SOUND_ENABLED = len(loaded) > 0
+
+def start_audio():
+    """Warm up audio in the background; the game runs silent until it's ready"""
+    global audio_thread
+    audio_thread = threading.Thread(target=warm_audio, name="audio warm-up", daemon=True)
+    audio_thread.start()
+
+def warm_particles():
+    """Create the particle system (needs numpy)"""
+    global particle_system
+    try:
+        from particles import ParticleSystem
+    except ImportError:
+        print("Particle effects need numpy (pip install numpy)")
+        return
+    particle_system = ParticleSystem(budget=governor.settings['particles'])
+
+def start_particles():
+    """Build the particle system in the background; effects are off until it's ready"""
+    threading.Thread(target=warm_particles, name="particles warm-up", daemon=True).start()
+
+def spawn_effects(events, source):
+    """Particles for one tick: explosions for hits and game over, laser trails"""
+    for x, y in source.hits:
+        particle_system.explosion(x, y)
+    if 'game_over' in events:
+        particle_system.blast(*source.paddle.center)
+    particle_system.trails(source.lasers)
+
+def tick_effects(events, source):
+    """Sounds, high scores and particles for one tick
+
+    ``source`` is the game state after the tick, or its snapshot.
+    """
+    for sound_name in events:
+        play_sound(sound_name)
+        if sound_name == 'game_over':
+            record_game(source.score)
+    if particle_system is not None:
+        # Once the game is over, its explosion plays out without new effects
+        if events or not source.game_over:
+            spawn_effects(events, source)
+        particle_system.update()
+
+def read_inputs(keys):
+    """Input bits for GameState.step() from pygame.key.get_pressed()"""
+    inputs = 0
+    if keys[pygame.K_LEFT]:
+        inputs |= INPUT_LEFT
+    if keys[pygame.K_RIGHT]:
+        inputs |= INPUT_RIGHT
+    if keys[pygame.K_SPACE]:
+        inputs |= INPUT_SHOOT
+    return inputs
+
+def wait_for_frame(deadline):
+    """Sleep until ``deadline`` in the event queue; returns [(arrival time, event)]"""
+    events = []
+    while True:
+        remaining_ms = (deadline - time.perf_counter()) * 1000
+        if remaining_ms < 1:
+            break
+        event = pygame.event.wait(int(remaining_ms))
+        if event.type != pygame.NOEVENT:
+            events.append((time.perf_counter(), event))
+    return events
+
+def restart():
+    """Front-end side of starting a new game"""
+    global background_music_started
+    if particle_system is not None:
+        particle_system.clear()
+    # Start background music on first game start
+    if SOUND_ENABLED and not background_music_started:
+        play_background_music()
+        background_music_started = True
 
 # Background music (simple loop)
 def play_background_music():
@@ -250,37 +223,12 @@ def play_background_music():
         return
     
     try:
-        # Create a simple background music pattern
-        sample_rate = 22050
-        duration = 2000  # 2 seconds
-        samples = int(sample_rate * duration / 1000)
-        
-        # Create a simple melody pattern
-        melody = []
-        for i in range(samples):
-            t = i / sample_rate
-            # Simple arpeggio pattern
-            freq1 = 220 + 110 * math.sin(2 * math.pi * 0.5 * t)  # A3 + E4
-            freq2 = 330 + 165 * math.sin(2 * math.pi * 0.75 * t)  # E4 + A4
-            
-            value1 = int(64 + 32 * math.sin(2 * math.pi * freq1 * t))
-            value2 = int(64 + 32 * math.sin(2 * math.pi * freq2 * t))
-            
-            melody.append((value1 + value2) // 2)
+        bg_sound = audio.make_sound('music')
+        bg_sound.set_volume(0.3)  # Lower volume for background
         
-        # Convert to sound using array buffer
-        try:
-            import array
-            sound_buffer = array.array('h', melody)
-            bg_sound = pygame.mixer.Sound(buffer=sound_buffer)
-            bg_sound.set_volume(0.3)  # Lower volume for background
-            
-            # Start background music loop
-            bg_sound.play(-1)  # -1 means loop indefinitely
-            print("Background music started!")
-            
-        except Exception as e:
-            print(f"Could not create background music: {e}")
+        # Start background music loop
+        bg_sound.play(-1)  # -1 means loop indefinitely
+        print("Background music started!")
         
     except Exception as e:
         print(f"Could not play background music: {e}")
@@ -288,122 +236,182 @@ def play_background_music():
 # Game state
 background_music_started = False
 show_high_scores = False
-
-def spawn_target():
-    x = random.randint(TARGET_RADIUS, WIDTH - TARGET_RADIUS)
-    targets.append([x, 0])  # [x, y]
+# How the last finished game placed (set once by record_game())
+last_game = {'new_record': False, 'high_score': False, 'previous_best': 0, 'rank': 0}
 
 def draw_laser(laser: pygame.Rect, style: int):
-    """Render a laser rect using the chosen visual style."""
-    if style == 1:
-        # Classic rectangle, sharp edges
-        pygame.draw.rect(screen, GREEN, laser, border_radius=0)
-
-    elif style == 2:
-        # Thick line beam centered on the rect
-        pygame.draw.line(screen, GREEN, (laser.centerx, laser.bottom), (laser.centerx, laser.top), 6)
-
-    elif style == 3:
-        # Glowing beam: thicker dim outer, bright inner
-        pygame.draw.line(screen, (0, 150, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 12)
-        pygame.draw.line(screen, (0, 255, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 6)
-
-    elif style == 4:
-        # Rounded "capsule" laser using border_radius
-        pygame.draw.rect(screen, GREEN, laser, border_radius=min(laser.width, laser.height) // 2)
-
-    elif style == 5:
-        # Neon-ish stacked lines (fake gradient) - made thicker
-        pygame.draw.line(screen, (0, 255, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 8)
-        pygame.draw.line(screen, (0, 200, 100), (laser.centerx - 2, laser.bottom), (laser.centerx - 2, laser.top), 4)
-        pygame.draw.line(screen, (0, 100, 255), (laser.centerx + 2, laser.bottom), (laser.centerx + 2, laser.top), 4)
-    else:
-        # Fallback
-        pygame.draw.rect(screen, GREEN, laser, border_radius=0)
+    """Render a laser rect straight onto the screen using the chosen visual style."""
+    return sprites.draw_laser(screen, laser, style, GREEN)
 
-def draw():
-    screen.fill(BLACK)
-    pygame.draw.rect(screen, BLUE, paddle)
+def centered(surface, y):
+    """Top-left position that centres a surface horizontally at height y"""
+    return (WIDTH // 2 - surface.get_width() // 2, y)
 
-    for laser in lasers:
-        draw_laser(laser, LASER_STYLE)
+def hud_texts():
+    """HUD text for this frame as a list of (slot, surface, pos)"""
+    score = view.score
+    texts = []
 
-    for tx, ty in targets:
-        pygame.draw.circle(screen, RED, (tx, ty), TARGET_RADIUS)
+    text = text_cache.render(font, f"Score: {score}", True, WHITE)
+    texts.append(('score', text, (10, 10)))
 
-    text = font.render(f"Score: {score}", True, WHITE)
-    screen.blit(text, (10, 10))
-
-    style_text = font.render(f"Style [{LASER_STYLE}]: {STYLE_NAMES[LASER_STYLE]}", True, WHITE)
-    screen.blit(style_text, (10, 45))
+    style_text = text_cache.render(font, f"Style [{LASER_STYLE}]: {STYLE_NAMES[LASER_STYLE]}", True, WHITE)
+    texts.append(('style', style_text, (10, 45)))
 
     # Sound status
-    sound_status = "ON" if SOUND_ENABLED else "OFF"
+    if SOUND_ENABLED:
+        sound_status = "ON"
+    elif audio_thread is not None and audio_thread.is_alive():
+        sound_status = "LOADING"
+    else:
+        sound_status = "OFF"
     music_status = "ON" if background_music_started else "OFF"
-    sound_text = font.render(f"Sound: {sound_status} | Music: {music_status}", True, WHITE)
-    screen.blit(sound_text, (10, 80))
+    sound_text = text_cache.render(font, f"Sound: {sound_status} | Music: {music_status}", True, WHITE)
+    texts.append(('sound', sound_text, (10, 80)))
 
     # High score display
     top_score = high_score_manager.get_top_score()
     if top_score > 0:
-        high_score_text = font.render(f"High Score: {top_score}", True, GOLD)
-        screen.blit(high_score_text, (WIDTH - high_score_text.get_width() - 10, 10))
-
-    if game_over:
-        over_text = font.render("Game Over - Press R to Restart", True, WHITE)
-        screen.blit(over_text, (WIDTH // 2 - over_text.get_width() // 2, HEIGHT // 2))
+        high_score_text = text_cache.render(font, f"High Score: {top_score}", True, GOLD)
+        texts.append(('high_score', high_score_text, (WIDTH - high_score_text.get_width() - 10, 10)))
+
+    # Dirty-rectangle mode reports how much of the screen it updated
+    if isinstance(renderer, DirtyRectRenderer):
+        dirty_text = text_cache.render(font, f"Dirty: {renderer.dirty_percent:.0f}%", True, WHITE)
+        texts.append(('dirty', dirty_text, (10, HEIGHT - 35)))
+
+    if timestep.speed > 1:
+        ff_text = text_cache.render(font, f"FAST FORWARD x{timestep.speed}", True, GOLD)
+        texts.append(('fast_forward', ff_text, centered(ff_text, HEIGHT // 2 - 50)))
+
+    # Reduced quality is shown so operators can tell the machine is struggling
+    if governor.level:
+        quality_text = text_cache.render(font, f"Quality: {governor.name}", True, WHITE)
+        texts.append(('quality', quality_text, (WIDTH - quality_text.get_width() - 10, HEIGHT - 35)))
+
+    # Profiler overlay
+    if profiler.overlay_visible:
+        for i, line in enumerate(profiler.overlay_lines() + [input_latency.overlay_line()]):
+            line_text = text_cache.render(small_font, line, True, GREEN)
+            texts.append((f'profiler{i}', line_text, (WIDTH - line_text.get_width() - 10, 45 + 20 * i)))
+
+    if view.game_over:
+        over_text = text_cache.render(font, "Game Over - Press R to Restart", True, WHITE)
+        texts.append(('over', over_text, centered(over_text, HEIGHT // 2)))
         
         # Show high score achievement if applicable
-        if high_score_manager.is_new_record(score):
-            record_text = font.render("🏆 NEW RECORD! 🏆", True, GOLD)
-            screen.blit(record_text, (WIDTH // 2 - record_text.get_width() // 2, HEIGHT // 2 + 50))
+        if last_game['new_record']:
+            record_text = text_cache.render(font, "🏆 NEW RECORD! 🏆", True, GOLD)
+            texts.append(('banner', record_text, centered(record_text, HEIGHT // 2 + 50)))
             
             # Show record details
-            details_text = font.render(f"You beat the previous record of {high_score_manager.get_top_score() - score} points!", True, WHITE)
-            screen.blit(details_text, (WIDTH // 2 - details_text.get_width() // 2, HEIGHT // 2 + 80))
-            
-            # Add to high scores
-            high_score_manager.add_score(score)
+            details_text = text_cache.render(font, f"You beat the previous record of {last_game['previous_best']} points!", True, WHITE)
+            texts.append(('details', details_text, centered(details_text, HEIGHT // 2 + 80)))
             
-        elif high_score_manager.add_score(score):
-            high_score_text = font.render("🎯 New High Score!", True, GOLD)
-            screen.blit(high_score_text, (WIDTH // 2 - high_score_text.get_width() // 2, HEIGHT // 2 + 50))
+        elif last_game['high_score']:
+            high_score_text = text_cache.render(font, "🎯 New High Score!", True, GOLD)
+            texts.append(('banner', high_score_text, centered(high_score_text, HEIGHT // 2 + 50)))
             
             # Show ranking info
             stats = high_score_manager.get_statistics()
-            rank_text = font.render(f"Ranked #{stats['total_games']} out of {stats['total_games']} scores", True, WHITE)
-            screen.blit(rank_text, (WIDTH // 2 - rank_text.get_width() // 2, HEIGHT // 2 + 80))
+            rank_text = text_cache.render(font, f"Ranked #{last_game['rank']} out of {stats['total_games']} games", True, WHITE)
+            texts.append(('details', rank_text, centered(rank_text, HEIGHT // 2 + 80)))
         
         # Show current session stats
         stats = high_score_manager.get_statistics()
         if stats['total_games'] > 0:
-            session_text = font.render(f"Session: {score} | Best: {stats['best_score']} | Games: {stats['total_games']}", True, GREEN)
-            screen.blit(session_text, (WIDTH // 2 - session_text.get_width() // 2, HEIGHT // 2 + 110))
-    
+            session_text = text_cache.render(font, f"Session: {score} | Best: {stats['best_score']} | Games: {stats['total_games']}", True, GREEN)
+            texts.append(('session', session_text, centered(session_text, HEIGHT // 2 + 110)))
+
+    return texts
+
+def record_game(score):
+    """Add a finished game to the high scores; called once per game"""
+    high_score_manager.refresh()  # Games other cabinets finished meanwhile
+    last_game['previous_best'] = high_score_manager.get_top_score()
+    last_game['new_record'] = score > 0 and high_score_manager.is_new_record(score)
+    last_game['high_score'] = high_score_manager.add_score(score, laser_style=LASER_STYLE,
+                                                          replay=recorder.replay().encode())
+    last_game['rank'] = high_score_manager.get_rank(score)
+
+def view_lag():
+    """How many ticks behind the newest one the frame is drawn (0..1)"""
+    return 0 if view.game_over or not governor.settings['interpolate'] else 1 - view_alpha
+
+def draw_sprites():
+    """Draw the paddle, lasers and targets in one batched blit from the atlas
+
+    Sprites are drawn between the last two simulation ticks, ``view_alpha``
+    of the way to the latest one. Lasers and targets move at a constant speed,
+    so only the paddle needs its previous position.
+    """
+    if sprite_atlas.style != LASER_STYLE:
+        sprite_atlas.build(LASER_STYLE)
+    lag = view_lag()
+    paddle = view.paddle
+    if lag:
+        paddle = paddle.move(round((view.prev_paddle_x - paddle.x) * lag), 0)
+    batch = sprite_atlas.batch(paddle, view.lasers, view.targets,
+                               laser_dy=round(LASER_SPEED * lag), target_dy=-round(TARGET_SPEED * lag))
+    renderer.sprites(screen.blits(batch, doreturn=renderer.tracks_sprites))
+
+    # Particles keep moving after game over, so they interpolate regardless
+    if particle_system is not None and particle_system.count:
+        lag = 1 - view_alpha if governor.settings['interpolate'] else 0
+        renderer.sprites(particle_system.draw(screen, lag))
+
+# HUD text from the last rebuild, refreshed every hud_interval frames
+hud_cache = []
+hud_age = 0
+
+# What the frame being drawn shows: the game state or a pipeline snapshot,
+# and how far past its tick the frame is (0..1)
+view = state
+view_alpha = 0.0
+
+def draw(snapshot=None, alpha=None):
+    """Draw a frame of the game, or of ``snapshot`` (pipelined mode)"""
+    global hud_cache, hud_age, view, view_alpha
+    view = state if snapshot is None else snapshot
+    view_alpha = timestep.alpha if alpha is None else alpha
+    if hud_age % governor.settings['hud_interval'] == 0:
+        hud_cache = hud_texts()
+    hud_age += 1
+    renderer.begin(hud_cache)
+    draw_sprites()
+
     # High score display screen
     if show_high_scores:
         draw_high_score_screen()
 
-def draw_high_score_screen():
-    """Draw the high score display screen"""
+    renderer.end(draw_sprites)
+
+# Pre-composited high score screen, rebuilt when the scores change
+high_score_panel = None
+high_score_panel_opaque = None  # Pre-blended onto black, for low quality levels
+high_score_panel_version = None
+HIGH_SCORE_POLL_S = 0.5  # How often the open high score screen looks for other cabinets' games
+high_score_polled = 0.0
+
+def build_high_score_panel():
+    """Render the overlay and the whole high score table into one surface"""
+    panel = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     # Semi-transparent overlay
-    overlay = pygame.Surface((WIDTH, HEIGHT))
-    overlay.set_alpha(128)
-    overlay.fill(BLACK)
-    screen.blit(overlay, (0, 0))
+    panel.fill((*BLACK, 128))
     
     # Title with decorative elements
     title = font.render("🏆 HIGH SCORES 🏆", True, GOLD)
-    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
+    panel.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
     
     # Statistics header
-    stats_text = f"Total Games: {len(high_score_manager.high_scores)} | Best: {high_score_manager.get_top_score()}"
+    stats = high_score_manager.get_statistics()
+    stats_text = f"Total Games: {stats['total_games']} | Best: {stats['best_score']} | Median: {stats['median_score']}"
     stats_surface = font.render(stats_text, True, WHITE)
-    screen.blit(stats_surface, (WIDTH // 2 - stats_surface.get_width() // 2, 120))
+    panel.blit(stats_surface, (WIDTH // 2 - stats_surface.get_width() // 2, 120))
     
     # Instructions
     instructions = font.render("Press H to close | ESC to clear scores", True, WHITE)
-    screen.blit(instructions, (WIDTH // 2 - instructions.get_width() // 2, 150))
+    panel.blit(instructions, (WIDTH // 2 - instructions.get_width() // 2, 150))
     
     # Column headers
     rank_header = font.render("RANK", True, GOLD)
@@ -413,14 +421,14 @@ def draw_high_score_screen():
     style_header = font.render("STYLE", True, GOLD)
     
     header_y = 180
-    screen.blit(rank_header, (WIDTH // 2 - 200, header_y))
-    screen.blit(score_header, (WIDTH // 2 - 100, header_y))
-    screen.blit(player_header, (WIDTH // 2, header_y))
-    screen.blit(date_header, (WIDTH // 2 + 100, header_y))
-    screen.blit(style_header, (WIDTH // 2 + 200, header_y))
+    panel.blit(rank_header, (WIDTH // 2 - 200, header_y))
+    panel.blit(score_header, (WIDTH // 2 - 100, header_y))
+    panel.blit(player_header, (WIDTH // 2, header_y))
+    panel.blit(date_header, (WIDTH // 2 + 100, header_y))
+    panel.blit(style_header, (WIDTH // 2 + 200, header_y))
     
     # Separator line
-    pygame.draw.line(screen, GOLD, (WIDTH // 2 - 220, header_y + 25), (WIDTH // 2 + 220, header_y + 25), 2)
+    pygame.draw.line(panel, GOLD, (WIDTH // 2 - 220, header_y + 25), (WIDTH // 2 + 220, header_y + 25), 2)
     
     # Display high scores
     y_pos = 210
@@ -443,57 +451,197 @@ def draw_high_score_screen():
             rank_color = WHITE
             
         rank_surface = font.render(rank_text, True, rank_color)
-        screen.blit(rank_surface, (WIDTH // 2 - 200, y_pos))
+        panel.blit(rank_surface, (WIDTH // 2 - 200, y_pos))
         
         # Score
         score_text = f"{score_data['score']:4d}"
         score_surface = font.render(score_text, True, GOLD if i == 0 else WHITE)
-        screen.blit(score_surface, (WIDTH // 2 - 100, y_pos))
+        panel.blit(score_surface, (WIDTH // 2 - 100, y_pos))
         
         # Player name
         player_text = score_data['player'][:8]  # Limit length
         player_surface = font.render(player_text, True, WHITE)
-        screen.blit(player_surface, (WIDTH // 2, y_pos))
+        panel.blit(player_surface, (WIDTH // 2, y_pos))
         
         # Date (shortened)
         date_text = score_data['date'][5:10]  # Just MM-DD
         date_surface = font.render(date_text, True, WHITE)
-        screen.blit(date_surface, (WIDTH // 2 + 100, y_pos))
+        panel.blit(date_surface, (WIDTH // 2 + 100, y_pos))
         
         # Laser style
         style_text = f"Style {score_data['laser_style']}"
         style_surface = font.render(style_text, True, WHITE)
-        screen.blit(style_surface, (WIDTH // 2 + 200, y_pos))
+        panel.blit(style_surface, (WIDTH // 2 + 200, y_pos))
         
         y_pos += 30
     
     # Show message if no high scores
     if not high_score_manager.high_scores:
         no_scores = font.render("No high scores yet! Play a game to set the first record!", True, WHITE)
-        screen.blit(no_scores, (WIDTH // 2 - no_scores.get_width() // 2, 250))
+        panel.blit(no_scores, (WIDTH // 2 - no_scores.get_width() // 2, 250))
         
         # Encouragement text
         encouragement = font.render("Try different laser styles (1-5) for variety!", True, GREEN)
-        screen.blit(encouragement, (WIDTH // 2 - encouragement.get_width() // 2, 280))
+        panel.blit(encouragement, (WIDTH // 2 - encouragement.get_width() // 2, 280))
+    
+    return panel.convert_alpha()
+
+def draw_high_score_screen():
+    """Draw the high score display screen"""
+    global high_score_panel, high_score_panel_opaque, high_score_panel_version, high_score_polled
+    # Other processes' games; the poll never waits on a busy database
+    now = time.perf_counter()
+    if now - high_score_polled >= HIGH_SCORE_POLL_S:
+        high_score_polled = now
+        high_score_manager.refresh()
+    if high_score_panel_version != high_score_manager.version:
+        high_score_panel = build_high_score_panel()
+        high_score_panel_opaque = None
+        high_score_panel_version = high_score_manager.version
+    panel = high_score_panel
+    if not governor.settings['overlay_alpha']:
+        if high_score_panel_opaque is None:
+            high_score_panel_opaque = pygame.Surface((WIDTH, HEIGHT))
+            high_score_panel_opaque.fill(BLACK)
+            high_score_panel_opaque.blit(high_score_panel, (0, 0))
+            high_score_panel_opaque = high_score_panel_opaque.convert()
+        panel = high_score_panel_opaque
     
     # Current session info
+    texts = []
+    score = view.score
     if score > 0:
         current_text = f"Current Session: {score} points"
-        current_surface = font.render(current_text, True, GREEN)
-        screen.blit(current_surface, (WIDTH // 2 - current_surface.get_width() // 2, HEIGHT - 60))
-
-def main():
-    global score, lasers, targets, last_shot_time, game_over, LASER_STYLE, background_music_started, show_high_scores
-
-    target_timer = 0
+        current_surface = text_cache.render(font, current_text, True, GREEN)
+        texts.append(('current', current_surface, centered(current_surface, HEIGHT - 60)))
+    renderer.overlay(panel, texts)
+
+def apply_quality():
+    """Switch renderers if the quality level no longer allows dirty rectangles"""
+    global renderer
+    dirty = DIRTY_RECTS and governor.settings['dirty_rects']
+    if dirty != isinstance(renderer, DirtyRectRenderer):
+        renderer = DirtyRectRenderer(screen, BLACK) if dirty else FullRenderer(screen, BLACK)
+    if particle_system is not None:
+        particle_system.budget = governor.settings['particles']
+
+def bootstrap(arrays=False, dirty_rects=False, profile=False, fps=FPS, fast_forward=FAST_FORWARD_SPEED,
+              quality='auto', spectate=None, particles=True, pipelined=False, low_latency=False):
+    """Create the window, fonts, renderer, high scores and game state
+
+    Returns a StartupTimer; main() adds the first frame to it. Audio is left
+    to start_audio(), which main() calls once the first frame is shown.
+    """
+    global high_score_manager, screen, clock, font, small_font, renderer, state
+    global RENDER_FPS, FAST_FORWARD_SPEED, DIRTY_RECTS, PARTICLES, PIPELINED, LOW_LATENCY, spectators
+    startup = StartupTimer(_import_start)
+    startup.mark('imports')
+
+    # Only what the first frame needs (pygame.init() would also open the mixer)
+    pygame.display.init()
+    pygame.font.init()
+    startup.mark('pygame')
+
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Laser Defender")
+    clock = pygame.time.Clock()
+    LOW_LATENCY = low_latency
+    if low_latency:
+        # Mouse motion and window chatter never reach the queue
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(LOW_LATENCY_EVENTS)
+    startup.mark('window')
+
+    # Same font SysFont(None, size) returns, without scanning the system fonts
+    font = pygame.font.Font(None, 36)
+    small_font = pygame.font.Font(None, 22)
+    startup.mark('fonts')
+
+    high_score_manager = HighScoreManager()
+    startup.mark('high scores')
+
+    DIRTY_RECTS = dirty_rects
+    governor.budget_ms = 1000 / (fps or FPS)
+    if quality != 'auto':
+        governor.level = QUALITY_NAMES.index(quality)
+        governor.adaptive = False
+    renderer = FullRenderer(screen, BLACK)
+    apply_quality()
+    if arrays:
+        from entity_store import ArrayGameState
+        state = ArrayGameState()
+    if profile:
+        profiler.enable()
+    RENDER_FPS = fps
+    FAST_FORWARD_SPEED = fast_forward
+    PARTICLES = particles
+    PIPELINED = pipelined
+    startup.mark('game')
+
+    if spectate is not None:
+        from spectator import SpectatorServer
+        try:
+            spectators = SpectatorServer(port=spectate).start()
+            print(f"Spectators can watch on port {spectators.port}")
+        except OSError as e:
+            print(f"Spectating unavailable: {e}")
+        startup.mark('spectators')
+    return startup
+
+def main(startup=None):
+    global LASER_STYLE, background_music_started, show_high_scores, simulation
+
+    recorder.start(state)
+    if PIPELINED:
+        # Phase timings would come from the simulation thread, so the
+        # profiler only sees the render thread's side
+        from pipeline import Simulation
+        simulation = Simulation(state, timestep, recorder,
+                                after_ticks=spectators.publish if spectators is not None else None).start()
+        snapshot = simulation.buffer.latest
+    else:
+        profiler.instrument(state)
+    last_frame = time.perf_counter()
+    next_preview = 0
+    sampled = None  # When the input of the newest tick was read
+    tapped = None  # When the fire key went down, until a tick has fired for it (--low-latency)
 
     while True:
-        dt = clock.tick(FPS)
-
-        for event in pygame.event.get():
+        profiler.begin_frame()
+        # The first frame isn't held back to the frame rate (audio starts after it)
+        frame_cap = RENDER_FPS if audio_thread is not None else 0
+        if LOW_LATENCY:
+            frame_events = wait_for_frame(last_frame + 1 / frame_cap if frame_cap else 0)
+        else:
+            clock.tick(frame_cap)
+            frame_events = []
+        now = time.perf_counter()
+        frame_ms = (now - last_frame) * 1000
+        last_frame = now
+        profiler.mark('wait')
+
+        frame_events.extend((now, event) for event in pygame.event.get())
+        for stamp, event in frame_events:
             if event.type == pygame.QUIT:
+                if governor.changes:
+                    stats = governor.stats()
+                    print(f"Quality: throttled {stats['throttled_percent']:.0f}% of frames, "
+                          f"lowest {stats['lowest_quality']}, {stats['changes']} changes")
+                if LOW_LATENCY:
+                    print(input_latency.summary())
+                if simulation is not None:
+                    simulation.close()
+                high_score_manager.close()
+                if spectators is not None:
+                    spectators.close()
+                if audio_thread is not None:
+                    audio_thread.join()
                 pygame.quit()
                 sys.exit()
+            if event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in GAME_KEYS:
+                input_latency.key_event(stamp)
+                if LOW_LATENCY and event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                    tapped = stamp
             # Toggle laser style with 1..5
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1: LASER_STYLE = 1
@@ -516,75 +664,114 @@ def main():
                 elif event.key == pygame.K_ESCAPE and show_high_scores:  # ESC key to clear scores when viewing
                     high_score_manager.clear_all_scores()
                     show_high_scores = False
-
+                # Profiler
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                elif event.key == pygame.K_F4 and profiler.enabled:
+                    trace_file = time.strftime("trace-%Y%m%d-%H%M%S.json")
+                    profiler.export_chrome_trace(trace_file)
+                    print(f"Frame trace written to {trace_file}")
+                # Fast-forward
+                elif event.key == pygame.K_f:
+                    timestep.speed = FAST_FORWARD_SPEED if timestep.speed == 1 else 1
+
+        profiler.mark('events')
+
+        # Input is read once per frame, after the wait and the events
         keys = pygame.key.get_pressed()
-
-        if not game_over:
-            # Move paddle
-            if keys[pygame.K_LEFT] and paddle.left > 0:
-                paddle.x -= 7
-            if keys[pygame.K_RIGHT] and paddle.right < WIDTH:
-                paddle.x += 7
-
-            # Shoot laser
-            if keys[pygame.K_SPACE] and pygame.time.get_ticks() - last_shot_time > SHOOT_DELAY:
-                laser = pygame.Rect(paddle.centerx - LASER_WIDTH // 2, paddle.top - LASER_HEIGHT, LASER_WIDTH, LASER_HEIGHT)
-                lasers.append(laser)
-                last_shot_time = pygame.time.get_ticks()
-                if SOUND_ENABLED:
-                    play_sound('shoot')
-
-            # Update lasers
-            for laser in lasers[:]:
-                laser.y -= LASER_SPEED
-                if laser.bottom < 0:
-                    lasers.remove(laser)
-
-            # Spawn targets
-            target_timer += dt
-            if target_timer > 1000:  # every second
-                spawn_target()
-                target_timer = 0
-
-            # Update targets
-            for target in targets[:]:
-                target[1] += TARGET_SPEED
-                if target[1] > HEIGHT:
-                    game_over = True
-                    if SOUND_ENABLED:
-                        play_sound('game_over')
-                # Collision detection (rect vs circle AABB)
-                for laser in lasers[:]:
-                    if pygame.Rect(target[0] - TARGET_RADIUS, target[1] - TARGET_RADIUS,
-                                   TARGET_RADIUS * 2, TARGET_RADIUS * 2).colliderect(laser):
-                        try:
-                            targets.remove(target)
-                            lasers.remove(laser)
-                            if SOUND_ENABLED:
-                                play_sound('hit')
-                        except ValueError:
-                            pass
-                        score += 1
-                        break
+        inputs = read_inputs(keys)
+        if tapped is not None:
+            inputs |= INPUT_SHOOT  # Fire even if the key was let go before this frame
+        input_time = time.perf_counter()
+
+        if simulation is not None:
+            # The simulation thread ticks on its own; play out what it did
+            simulation.set_inputs(inputs)
+            for snapshot in simulation.buffer.take():
+                tick_effects(snapshot.events, snapshot)
+            if not snapshot.game_over:
+                sampled = snapshot.sampled
+            if snapshot.game_over and keys[pygame.K_r]:
+                simulation.reset()
+                restart()
+        elif not state.game_over:
+            for _ in range(timestep.advance(frame_ms)):
+                recorder.record(inputs)
+                events = state.step(inputs, TICK_MS)
+                sampled = input_time
+                tick_effects(events, state)
+                if state.game_over:
+                    break
         else:
+            # The game is frozen, but its explosion plays out
+            if particle_system is not None:
+                for _ in range(timestep.advance(frame_ms)):
+                    particle_system.update()
             if keys[pygame.K_r]:
-                # Reset game
-                score = 0
-                targets.clear()
-                lasers.clear()
-                game_over = False
-                paddle.x = WIDTH // 2 - PADDLE_WIDTH // 2
-                # Optional: reset timers so the first second is calm
-                target_timer = 0
-                last_shot_time = 0
-                # Start background music on first game start
-                if SOUND_ENABLED and not background_music_started:
-                    play_background_music()
-                    background_music_started = True
-
-        draw()
-        pygame.display.flip()
+                # Reset game (fresh seed, timers reset so the first second is calm)
+                state.reset()
+                timestep.reset()
+                recorder.start(state)
+                restart()
+
+        if tapped is not None and sampled is not None and sampled >= tapped:
+            tapped = None
+        if spectators is not None and simulation is None:
+            spectators.publish(state)
+
+        profiler.mark('update')
+
+        # Fast-forward skips rendering apart from an occasional preview frame
+        if timestep.speed == 1 or now >= next_preview:
+            if simulation is not None:
+                draw(snapshot, 1.0 if LOW_LATENCY else simulation.alpha(snapshot, time.perf_counter()))
+            else:
+                draw(alpha=1.0 if LOW_LATENCY else None)
+            profiler.mark('draw')
+            renderer.present()
+            profiler.mark('flip')
+            input_latency.flipped(sampled, view_lag() * TICK_MS)
+            if governor.record((time.perf_counter() - now) * 1000):
+                apply_quality()
+            next_preview = now + FAST_FORWARD_PREVIEW_MS / 1000
+        profiler.end_frame()
+
+        if audio_thread is None:
+            # The first frame is on screen: report start-up, then warm up audio
+            if startup is not None:
+                startup.mark('first frame')
+                print(startup.report())
+            start_audio()
+            if PARTICLES:
+                start_particles()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Laser Defender")
+    parser.add_argument("--arrays", action="store_true",
+                        help="keep lasers and targets in NumPy arrays (needs numpy)")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="redraw and update only the screen regions that changed")
+    parser.add_argument("--profile", action="store_true",
+                        help="record frame timings from the start (F3 shows them, F4 exports a trace)")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="frames drawn per second, 0 for uncapped (the simulation always ticks at %d/s)" % FPS)
+    parser.add_argument("--fast-forward", type=int, default=FAST_FORWARD_SPEED, metavar="N",
+                        help="simulation speed while fast-forwarding with F (default %(default)s)")
+    parser.add_argument("--quality", choices=['auto'] + QUALITY_NAMES, default='auto',
+                        help="visual detail; auto lowers it while frames run over budget (default)")
+    parser.add_argument("--spectate", type=int, metavar="PORT",
+                        help="stream the game to spectators on this port (python spectator.py watch)")
+    parser.add_argument("--no-particles", action="store_true",
+                        help="turn off explosion and laser trail effects")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run the simulation on its own thread while the main thread draws")
+    parser.add_argument("--low-latency", action="store_true",
+                        help="cut input-to-display lag; reports it on exit (F3 shows it live)")
+    args = parser.parse_args()
+    main(bootstrap(arrays=args.arrays, dirty_rects=args.dirty_rects, profile=args.profile,
+                   fps=args.fps, fast_forward=args.fast_forward, quality=args.quality, spectate=args.spectate,
+                   particles=not args.no_particles, pipelined=args.pipelined,
+                   low_latency=args.low_latency))
 
@@ -0,0 +1,254 @@
+"""Particle effects: explosions, debris and laser trails.
+
+``ParticleSystem`` keeps every particle's position, velocity, age,
+lifetime and colour in preallocated NumPy arrays. ``update()`` moves them
+all with a handful of array operations per tick. Particles are stored in
+the order they were emitted, and removing dead ones keeps that order, so
+the oldest are always at the front. When an emission would go over
+``budget``, the oldest particles are dropped first.
+
+Drawing maps each particle to a pre-rendered sprite: its palette colour,
+faded by how much of its life is gone. ``draw()`` either writes those
+colours straight into the surface through a ``pygame.surfarray.pixels2d``
+view, or blits the pooled sprites with one ``Surface.blits()`` call. The
+pixel writes are several times faster; ``mode='blits'`` is for surfaces
+``pixels2d`` can't view. Both honour the surface's clip rect, so
+dirty-rectangle repairs of HUD text only repaint the particles under it.
+
+Cosmetic only: effects have their own RNG and never touch the game state,
+so replays are unaffected. Needs numpy.
+"""
+import numpy as np
+import pygame
+
+from game_state import WIDTH, HEIGHT
+
+MAX_PARTICLES = 10000
+PARTICLE_SIZE = 2
+FADE_STEPS = 8
+GRAVITY = 0.15  # px per tick per tick
+# Palette indices for emit()
+SPARK, DEBRIS, TRAIL, FIRE = range(4)
+PALETTE = (
+    (255, 255, 180),  # SPARK: hot white-yellow
+    (255, 60, 60),    # DEBRIS: target red
+    (0, 255, 120),    # TRAIL: laser green
+    (255, 150, 0),    # FIRE: orange
+)
+
+
+class ParticleSystem:
+    """Up to ``budget`` particles, updated in batches and drawn from a sprite pool"""
+
+    def __init__(self, budget=MAX_PARTICLES, capacity=MAX_PARTICLES, palette=PALETTE, seed=None):
+        self.capacity = capacity
+        self._budget = min(budget, capacity)
+        self.palette = palette
+        self.count = 0
+        self.evicted = 0  # Particles dropped early to stay within the budget
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.float32)
+        self.life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.uint8)
+        self._fields = (self.x, self.y, self.vx, self.vy, self.age, self.life, self.color)
+
+        # One sprite per palette colour and fade step, brightest first
+        self.sprites = []
+        self.shades = []
+        for r, g, b in palette:
+            for step in range(FADE_STEPS):
+                fade = 1 - step / FADE_STEPS
+                shade = (int(r * fade), int(g * fade), int(b * fade))
+                sprite = pygame.Surface((PARTICLE_SIZE, PARTICLE_SIZE))
+                sprite.fill(shade)
+                self.sprites.append(sprite)
+                self.shades.append(shade)
+        self._mapped = {}  # surface pixel format -> mapped shade array
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @budget.setter
+    def budget(self, budget):
+        """Lower or raise the hard cap; excess particles go oldest first"""
+        self._budget = min(budget, self.capacity)
+        if self.count > self._budget:
+            self._evict(self.count - self._budget)
+
+    def clear(self):
+        self.count = 0
+
+    def _evict(self, n):
+        """Drop the ``n`` oldest particles"""
+        keep = self.count - n
+        for field in self._fields:
+            field[:keep] = field[n:self.count]
+        self.count = keep
+        self.evicted += n
+
+    def _reserve(self, n):
+        """Make room for ``n`` new particles; returns the slice to fill and how many fit"""
+        n = min(n, self._budget)
+        if n <= 0:
+            return None, 0
+        overflow = self.count + n - self._budget
+        if overflow > 0:
+            self._evict(overflow)
+        start = self.count
+        self.count += n
+        return slice(start, start + n), n
+
+    def emit(self, x, y, n, speed, life, color, angle=0.0, spread=2 * np.pi):
+        """Burst of ``n`` particles from (x, y) at up to ``speed`` px/tick
+
+        Directions are within ``spread`` radians around ``angle`` (0 points
+        right, pi/2 down); lifetimes are between half and all of ``life``
+        ticks.
+        """
+        area, n = self._reserve(n)
+        if not n:
+            return
+        rng = self.rng
+        theta = rng.uniform(angle - spread / 2, angle + spread / 2, n)
+        velocity = rng.uniform(0.2 * speed, speed, n)
+        self.x[area] = x
+        self.y[area] = y
+        self.vx[area] = np.cos(theta) * velocity
+        self.vy[area] = np.sin(theta) * velocity
+        self.age[area] = 0
+        self.life[area] = rng.uniform(0.5 * life, life, n)
+        self.color[area] = color
+
+    def emit_points(self, xs, ys, vx, vy, life, color):
+        """One particle at each (xs[i], ys[i]), all with the same velocity"""
+        area, n = self._reserve(len(xs))
+        if not n:
+            return
+        self.x[area] = xs[-n:]
+        self.y[area] = ys[-n:]
+        self.vx[area] = vx
+        self.vy[area] = vy
+        self.age[area] = 0
+        self.life[area] = life
+        self.color[area] = color
+
+    def explosion(self, x, y):
+        """A destroyed target: red debris and a flash of sparks"""
+        self.emit(x, y, 24, speed=3, life=40, color=DEBRIS)
+        self.emit(x, y, 16, speed=5, life=16, color=SPARK)
+
+    def blast(self, x, y):
+        """Game over: a fountain of fire and sparks from the paddle"""
+        self.emit(x, y, 600, speed=9, life=90, color=FIRE, angle=-np.pi / 2, spread=np.pi)
+        self.emit(x, y, 200, speed=5, life=60, color=SPARK)
+
+    def trails(self, lasers):
+        """A fading spark behind every laser (call once per tick)"""
+        if lasers:
+            self.emit_points([laser.centerx for laser in lasers], [laser.bottom for laser in lasers],
+                             0, 1, 10, TRAIL)
+
+    def update(self):
+        """Advance every particle one tick and drop the dead or off-screen ones"""
+        n = self.count
+        if not n:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        vy = self.vy[:n]
+        age = self.age[:n]
+        x += self.vx[:n]
+        vy += GRAVITY
+        y += vy
+        age += 1
+        alive = age < self.life[:n]
+        alive &= x >= 0
+        alive &= x < WIDTH - PARTICLE_SIZE
+        alive &= y >= 0
+        alive &= y < HEIGHT - PARTICLE_SIZE
+        if alive.all():
+            return
+        keep = np.flatnonzero(alive)
+        for field in self._fields:
+            field[:len(keep)] = field[keep]
+        self.count = len(keep)
+
+    def _positions(self, lag):
+        """Integer draw positions, ``lag`` ticks behind the last update"""
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        if lag:
+            x = x - self.vx[:n] * lag
+            y = y - self.vy[:n] * lag
+            np.clip(x, 0, WIDTH - PARTICLE_SIZE, out=x)
+            np.clip(y, 0, HEIGHT - PARTICLE_SIZE, out=y)
+        return x.astype(np.intp), y.astype(np.intp)
+
+    def _sprite_index(self):
+        n = self.count
+        step = (self.age[:n] * FADE_STEPS / self.life[:n]).astype(np.intp)
+        np.minimum(step, FADE_STEPS - 1, out=step)
+        step += self.color[:n].astype(np.intp) * FADE_STEPS
+        return step
+
+    def bounds(self):
+        """Rect around every particle (for dirty-rectangle rendering)"""
+        if not self.count:
+            return pygame.Rect(0, 0, 0, 0)
+        x = self.x[:self.count]
+        y = self.y[:self.count]
+        left = int(x.min())
+        top = int(y.min())
+        # Interpolation only moves particles back along their path, and
+        # update() keeps them on screen, so pad by the largest step
+        pad = int(max(np.abs(self.vx[:self.count]).max(), np.abs(self.vy[:self.count]).max())) + 1
+        return pygame.Rect(left - pad, top - pad, int(x.max()) - left + PARTICLE_SIZE + 2 * pad,
+                           int(y.max()) - top + PARTICLE_SIZE + 2 * pad)
+
+    def draw(self, surface, lag=0.0, mode='pixels'):
+        """Draw every particle onto ``surface``; returns the rects touched"""
+        if not self.count:
+            return []
+        x, y = self._positions(lag)
+        index = self._sprite_index()
+        if mode == 'pixels':
+            try:
+                self._draw_pixels(surface, x, y, index)
+                return [self.bounds()]
+            except ValueError:
+                pass  # No pixels2d view of this surface (e.g. 24-bit)
+        sprites = self.sprites
+        sequence = zip(map(sprites.__getitem__, index.tolist()), zip(x.tolist(), y.tolist()))
+        return surface.blits(sequence, doreturn=True) or []
+
+    def _draw_pixels(self, surface, x, y, index):
+        key = (surface.get_bitsize(), surface.get_masks())
+        mapped = self._mapped.get(key)
+        if mapped is None:
+            view = pygame.surfarray.pixels2d(surface)
+            mapped = self._mapped[key] = np.array([surface.map_rgb(shade) for shade in self.shades],
+                                                  dtype=view.dtype)
+            del view
+        pixels = mapped[index]
+        # The view writes past the clip rect, so mask to it by hand
+        clip = surface.get_clip()
+        clipped = clip != surface.get_rect()
+        view = pygame.surfarray.pixels2d(surface)
+        try:
+            for dx in range(PARTICLE_SIZE):
+                for dy in range(PARTICLE_SIZE):
+                    px = x + dx
+                    py = y + dy
+                    if clipped:
+                        inside = (px >= clip.left) & (px < clip.right) & (py >= clip.top) & (py < clip.bottom)
+                        view[px[inside], py[inside]] = pixels[inside]
+                    else:
+                        view[px, py] = pixels
+        finally:
+            del view  # Unlock the surface
@@ -0,0 +1,126 @@
+"""Crash-safe, non-blocking file persistence.
+
+``BackgroundWriter`` owns one file. ``submit()`` only stores the latest
+data and returns at once; a daemon thread waits ``delay`` seconds so bursts
+of updates coalesce, then writes the newest data with ``atomic_write()``
+(temp file in the same directory, fsync, rename, fsync of the directory).
+A power cut therefore leaves either the old file or the new one, never a
+torn write. The new file keeps the old one's permissions, or gets the
+umask's like a plain ``open()`` would, so other users can still read it.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def _file_mode(path):
+    """Permission bits for a new version of ``path``"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)  # Reading the umask means setting it
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path, data):
+    """Replace ``path`` with ``data`` (bytes) so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _file_mode(path))  # mkstemp makes it owner-only
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Directories can't be opened on Windows
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def encode_json(data):
+    return json.dumps(data, indent=2).encode()
+
+
+class BackgroundWriter:
+    """Write the latest submitted data to ``path`` on a background thread"""
+
+    def __init__(self, path, encode=encode_json, delay=0.25):
+        self.path = path
+        self.encode = encode
+        self.delay = delay
+        self.writes = 0
+        self._pending = None
+        self._has_pending = False
+        self._busy = False
+        self._closed = False
+        self._flushing = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"writer:{path}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, data):
+        """Queue ``data`` to be written; replaces anything not yet written"""
+        with self._cond:
+            self._pending = data
+            self._has_pending = True
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far is on disk"""
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._has_pending and not self._busy, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._has_pending or self._closed)
+                if not self._has_pending:
+                    return
+                # Debounce: let a burst of submits collapse into one write
+                deadline = time.monotonic() + self.delay
+                while not self._closed and not self._flushing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                data = self._pending
+                self._pending = None
+                self._has_pending = False
+                self._busy = True
+            try:
+                atomic_write(self.path, self.encode(data))
+                self.writes += 1
+            except Exception as e:
+                print(f"Error saving {self.path}: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,283 @@
+"""Pipelined game loop: the simulation ticks on its own thread.
+
+The serial loop in ``laser_defender.main()`` simulates, draws and flips one
+after the other, so a slow blit or font render holds up the next tick. In
+pipelined mode (``--pipelined``) a ``Simulation`` thread runs the fixed
+ticks on its own clock. After every tick it publishes an immutable
+``Snapshot`` to a ``SnapshotBuffer``. The main thread stays the render
+thread, because SDL wants window and event calls on the thread that created
+the window. Each frame it takes the newest snapshot and draws it. pygame
+releases the GIL while it blits, fills and flips, so the simulation keeps
+ticking during the slow part of a frame.
+
+The buffer works like triple buffering. The simulation never waits for the
+renderer, and the renderer always gets the newest tick. Snapshots are
+never changed once published, so they are handed over by reference, not
+copied into fixed slots. Each snapshot carries its tick's events and hits.
+The renderer gets every snapshot since its last take, so sounds and
+explosions aren't lost when a frame spans several ticks.
+
+``python pipeline.py`` compares tick timing, frame rate and input-to-flip
+latency with the serial loop, headless, under an adjustable render load.
+"""
+import collections
+import threading
+import time
+
+from game_state import FixedTimestep, TICK_MS
+
+MAX_PENDING = 600  # Snapshots kept for a renderer that stops taking them (10 s)
+
+Snapshot = collections.namedtuple(
+    'Snapshot', 'tick time sampled paddle prev_paddle_x lasers targets score game_over events hits')
+Snapshot.__doc__ = """One tick of the game, safe to read from any thread
+
+``paddle``, ``prev_paddle_x``, ``lasers``, ``targets``, ``score`` and
+``game_over`` are what drawing reads from a GameState. ``time`` is when the
+tick ran and ``sampled`` when the input it used was read (perf_counter
+seconds).
+"""
+
+
+def capture(state, tick, now, sampled, events):
+    """Immutable copy of what drawing needs from ``state``"""
+    return Snapshot(tick, now, sampled, state.paddle.copy(), state.prev_paddle_x,
+                    tuple([laser.copy() for laser in state.lasers]), tuple(map(tuple, state.targets)),
+                    state.score, state.game_over, tuple(events), tuple(state.hits))
+
+
+class SnapshotBuffer:
+    """Hands snapshots from the simulation thread to the render thread"""
+
+    def __init__(self, max_pending=MAX_PENDING):
+        self._lock = threading.Lock()
+        self._pending = collections.deque(maxlen=max_pending)
+        self.latest = None
+
+    def publish(self, snapshot):
+        with self._lock:
+            self._pending.append(snapshot)
+            self.latest = snapshot
+
+    def take(self):
+        """Every snapshot published since the last take, oldest first"""
+        with self._lock:
+            if not self._pending:
+                return ()
+            taken = tuple(self._pending)
+            self._pending.clear()
+            return taken
+
+
+class Simulation:
+    """Runs ``state`` in fixed ticks on a background thread
+
+    ``timestep`` paces the ticks (its ``speed`` can be changed at any time
+    for fast-forward). Input comes from ``set_inputs()``. Every tick is
+    recorded in ``recorder`` and published to ``buffer``, including ticks
+    after game over, so effects keep time. ``after_ticks(state)`` is
+    called on the simulation thread after each batch of ticks, e.g. to
+    publish to spectators.
+    """
+
+    def __init__(self, state, timestep=None, recorder=None, after_ticks=None):
+        self.state = state
+        self.timestep = timestep or FixedTimestep()
+        self.recorder = recorder
+        self.after_ticks = after_ticks
+        self.buffer = SnapshotBuffer()
+        self.ticks = 0
+        self._inputs = (0, time.perf_counter())  # (input bits, when they were read)
+        self._reset = False
+        self._stop = False
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._publish([], time.perf_counter())
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def set_inputs(self, inputs):
+        self._inputs = (inputs, time.perf_counter())
+
+    def reset(self):
+        """Start a new game before the next tick, if the current one is over"""
+        self._reset = True
+        self._wake.set()
+
+    def alpha(self, snapshot, now):
+        """How far past ``snapshot`` towards the next tick ``now`` is (0..1)"""
+        timestep = self.timestep
+        return min(1.0, (now - snapshot.time) * 1000 * timestep.speed / timestep.tick_ms)
+
+    def _publish(self, events, sampled):
+        now = time.perf_counter()
+        self.buffer.publish(capture(self.state, self.ticks, now, sampled, events))
+
+    def _run(self):
+        state = self.state
+        timestep = self.timestep
+        recorder = self.recorder
+        last = time.perf_counter()
+        while not self._stop:
+            if self._reset:
+                # Only a finished game is reset, so a request repeated from
+                # frames drawn before the new game showed up does nothing
+                if state.game_over:
+                    state.reset()
+                    timestep.reset()
+                    if recorder is not None:
+                        recorder.start(state)
+                    self._publish([], time.perf_counter())
+                self._reset = False
+
+            now = time.perf_counter()
+            ticks = timestep.advance((now - last) * 1000)
+            last = now
+            for _ in range(ticks):
+                inputs, sampled = self._inputs
+                if state.game_over:
+                    events = []
+                else:
+                    if recorder is not None:
+                        recorder.record(inputs)
+                    events = state.step(inputs, timestep.tick_ms)
+                self.ticks += 1
+                self._publish(events, sampled)
+            if ticks and self.after_ticks is not None:
+                self.after_ticks(state)
+
+            # Sleep until the next tick is due (or a reset or close)
+            delay = (timestep.tick_ms - timestep.accumulator) / timestep.speed / 1000
+            if self._wake.wait(max(delay, 0)):
+                self._wake.clear()
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return 0.0, 0.0
+    return values[len(values) // 2], values[int(len(values) * 0.99)]
+
+
+def compare(seconds=5, load=20, arrays=False, spawn_interval=100, shoot_delay=50):
+    """Play autopilot games headless with the serial and the pipelined loop
+
+    ``load`` extra full-screen blits per frame stand in for a slow renderer.
+    Reports ticks per second, the gap between ticks, frames per second and
+    input-to-flip latency: from reading the input to the flip of the first
+    frame showing a tick that used it.
+    """
+    import os
+    import tempfile
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+
+    import laser_defender as game
+    from game_state import autopilot
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # Keep the high score files out of the way
+        try:
+            game.bootstrap(arrays=arrays, fps=0, quality='high', particles=False)
+            background = pygame.Surface(game.screen.get_size()).convert()
+            background.fill((1, 2, 3))
+
+            def new_state():
+                return type(game.state)(seed=0, spawn_interval=spawn_interval, shoot_delay=shoot_delay)
+
+            def render(snapshot=None, alpha=None):
+                for _ in range(load):
+                    game.screen.blit(background, (0, 0))
+                game.draw(snapshot, alpha)
+                game.renderer.present()
+
+            def serial():
+                state = game.state = new_state()
+                timestep = FixedTimestep()
+                tick_times = []
+                latencies = []
+                frames = 0
+                last = start = time.perf_counter()
+                while last - start < seconds:
+                    pygame.event.pump()
+                    now = time.perf_counter()
+                    ticks = timestep.advance((now - last) * 1000)
+                    last = now
+                    sampled = time.perf_counter()
+                    inputs = autopilot(state)
+                    for _ in range(ticks):
+                        if state.game_over:
+                            state.reset()
+                        state.step(inputs, TICK_MS)
+                        tick_times.append(time.perf_counter())
+                    render()
+                    frames += 1
+                    if ticks:
+                        latencies.append((time.perf_counter() - sampled) * 1000)
+                return tick_times, frames, latencies, time.perf_counter() - start
+
+            def pipelined():
+                game.state = new_state()
+                simulation = Simulation(game.state, FixedTimestep()).start()
+                tick_times = []
+                latencies = []
+                frames = 0
+                view = simulation.buffer.latest
+                start = time.perf_counter()
+                while time.perf_counter() - start < seconds:
+                    pygame.event.pump()
+                    simulation.set_inputs(autopilot(view))
+                    taken = simulation.buffer.take()
+                    if taken:
+                        tick_times.extend(snapshot.time for snapshot in taken)
+                        view = taken[-1]
+                        if view.game_over:
+                            simulation.reset()
+                    render(view, simulation.alpha(view, time.perf_counter()))
+                    frames += 1
+                    if taken:
+                        latencies.append((time.perf_counter() - view.sampled) * 1000)
+                elapsed = time.perf_counter() - start
+                simulation.close()
+                return tick_times, frames, latencies, elapsed
+
+            results = [("serial", serial()), ("pipelined", pipelined())]
+            game.high_score_manager.close()
+        finally:
+            os.chdir(cwd)
+
+    print(f"{seconds:g} s per loop, {load} extra full-screen blits per frame, "
+          f"{'ArrayGameState' if arrays else 'GameState'}")
+    for label, (tick_times, frames, latencies, elapsed) in results:
+        gaps = [(b - a) * 1000 for a, b in zip(tick_times, tick_times[1:])]
+        gap = _percentiles(gaps)
+        latency = _percentiles(latencies)
+        print(f"{label:>9}: {len(tick_times) / elapsed:5.1f} ticks/s (gap p50 {gap[0]:5.1f} ms, p99 {gap[1]:5.1f} ms), "
+              f"{frames / elapsed:6.1f} frames/s, input-to-flip p50 {latency[0]:5.1f} ms, p99 {latency[1]:5.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the serial and pipelined game loops")
+    parser.add_argument("--seconds", type=float, default=5, help="time per loop (default %(default)s)")
+    parser.add_argument("--load", type=int, nargs='+', default=[0, 20, 60],
+                        help="extra full-screen blits per frame, one run each (default %(default)s)")
+    parser.add_argument("--arrays", action="store_true", help="use ArrayGameState (needs numpy)")
+    args = parser.parse_args()
+    for load in args.load:
+        compare(args.seconds, load, args.arrays)
@@ -0,0 +1,233 @@
+"""Per-phase frame profiler with a ring buffer and Chrome trace export.
+
+The main loop calls ``begin_frame()``, then ``mark(phase)`` at the end of
+each phase (the time since the previous mark is charged to that phase), and
+``end_frame()``. ``instrument()`` wraps methods of an object, e.g. the
+GameState update phases, so they are timed as nested phases.
+
+Timings go into preallocated ring buffers (the last ``frames`` frames and
+their individual phase events). While disabled, ``begin_frame()``/``mark()``
+/``end_frame()`` return immediately and instrumented methods are unwrapped,
+so the cost is a few attribute lookups per frame. A frame only counts if
+profiling was on when it began.
+
+``export_chrome_trace()`` writes the buffered events in the Chrome trace
+event format, which chrome://tracing and https://ui.perfetto.dev open.
+
+``StartupTimer`` breaks the time to the first frame down into start-up
+steps in the same way, with ``mark(step)`` after each one.
+"""
+import json
+import time
+from array import array
+
+# Top-level phases of a frame, in loop order
+FRAME_PHASES = ('wait', 'events', 'update', 'draw', 'flip')
+# GameState.step() phases, nested inside 'update'
+UPDATE_PHASES = {
+    'update_paddle': 'paddle',
+    'update_lasers': 'lasers',
+    'update_spawner': 'spawn',
+    'update_targets': 'targets',
+    'collide': 'collision',
+}
+
+
+class FrameProfiler:
+    def __init__(self, frames=600, enabled=False, refresh_frames=30):
+        self.phases = list(FRAME_PHASES) + list(UPDATE_PHASES.values())
+        self._phase_ids = {name: i for i, name in enumerate(self.phases)}
+        self.capacity = frames
+        self.refresh_frames = refresh_frames
+        self.enabled = False
+        self.overlay_visible = False
+        self._instrumented = []
+        self._epoch = time.perf_counter()
+        self.clear()
+        if enabled:
+            self.enable()
+
+    def clear(self):
+        n_phases = len(self.phases)
+        self.frame_count = 0
+        # One row per frame: start, total duration, then per-phase totals
+        self._frame_start = array('d', bytes(8 * self.capacity))
+        self._frame_total = array('d', bytes(8 * self.capacity))
+        self._frame_phase = array('d', bytes(8 * self.capacity * n_phases))
+        self._current = [0.0] * n_phases
+        # Individual phase events for trace export
+        self._event_capacity = self.capacity * 32
+        self._event_count = 0
+        self._event_phase = array('B', bytes(self._event_capacity))
+        self._event_start = array('d', bytes(8 * self._event_capacity))
+        self._event_duration = array('d', bytes(8 * self._event_capacity))
+        self._start = self._last = 0.0
+        self._frame_open = False
+        self._summary = []
+
+    # -- switching on and off -------------------------------------------
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for obj, methods in self._instrumented:
+                self._wrap(obj, methods)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            self._frame_open = False
+            for obj, methods in self._instrumented:
+                for name in methods:
+                    obj.__dict__.pop(name, None)
+
+    def toggle_overlay(self):
+        """Show or hide the overlay; profiling runs while it is visible"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enable()
+
+    def instrument(self, obj, methods=UPDATE_PHASES):
+        """Time ``obj``'s methods (name -> phase) whenever the profiler is on"""
+        self._instrumented.append((obj, methods))
+        if self.enabled:
+            self._wrap(obj, methods)
+
+    def _wrap(self, obj, methods):
+        perf = time.perf_counter
+        record = self._record
+        for name, phase in methods.items():
+            method = getattr(type(obj), name).__get__(obj)
+            phase_id = self._phase_ids[phase]
+
+            def timed(*args, _method=method, _phase_id=phase_id, **kwargs):
+                start = perf()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    record(_phase_id, start, perf())
+            setattr(obj, name, timed)
+
+    # -- recording ------------------------------------------------------
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_open = True
+        self._start = self._last = time.perf_counter()
+        self._current = [0.0] * len(self.phases)
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to ``phase``"""
+        if not self._frame_open:
+            return
+        now = time.perf_counter()
+        self._record(self._phase_ids[phase], self._last, now)
+        self._last = now
+
+    def end_frame(self):
+        if not self._frame_open:
+            return
+        self._frame_open = False
+        now = time.perf_counter()
+        row = self.frame_count % self.capacity
+        self._frame_start[row] = self._start - self._epoch
+        self._frame_total[row] = now - self._start
+        n_phases = len(self.phases)
+        self._frame_phase[row * n_phases:(row + 1) * n_phases] = array('d', self._current)
+        self.frame_count += 1
+        if self.overlay_visible and self.frame_count % self.refresh_frames == 0:
+            self._summary = self._build_summary()
+
+    def _record(self, phase_id, start, end):
+        self._current[phase_id] += end - start
+        i = self._event_count % self._event_capacity
+        self._event_phase[i] = phase_id
+        self._event_start[i] = start - self._epoch
+        self._event_duration[i] = end - start
+        self._event_count += 1
+
+    # -- reporting ------------------------------------------------------
+
+    def _rows(self):
+        return range(min(self.frame_count, self.capacity))
+
+    def frame_times(self, busy=False):
+        """Frame times in ms over the window; ``busy`` leaves out the 'wait' phase"""
+        wait = self._phase_ids['wait']
+        n_phases = len(self.phases)
+        if busy:
+            return [(self._frame_total[r] - self._frame_phase[r * n_phases + wait]) * 1000 for r in self._rows()]
+        return [self._frame_total[r] * 1000 for r in self._rows()]
+
+    def percentiles(self, busy=False, points=(50, 95, 99)):
+        times = sorted(self.frame_times(busy))
+        if not times:
+            return {p: 0.0 for p in points}
+        return {p: times[min(len(times) - 1, int(len(times) * p / 100))] for p in points}
+
+    def phase_means(self):
+        """Mean ms per frame spent in each phase over the window"""
+        rows = self._rows()
+        n_phases = len(self.phases)
+        if not rows:
+            return {name: 0.0 for name in self.phases}
+        return {name: sum(self._frame_phase[r * n_phases + i] for r in rows) * 1000 / len(rows)
+                for i, name in enumerate(self.phases)}
+
+    def _build_summary(self):
+        frame = self.percentiles()
+        busy = self.percentiles(busy=True)
+        means = self.phase_means()
+        return [
+            "frame p50 {:.1f} p95 {:.1f} p99 {:.1f} ms".format(frame[50], frame[95], frame[99]),
+            "busy  p50 {:.1f} p95 {:.1f} p99 {:.1f} ms".format(busy[50], busy[95], busy[99]),
+            "  ".join(f"{name} {means[name]:.2f}" for name in FRAME_PHASES[1:]),
+            "  ".join(f"{name} {means[name]:.3f}" for name in UPDATE_PHASES.values()),
+        ]
+
+    def overlay_lines(self):
+        """Summary text for the overlay, refreshed every ``refresh_frames`` frames"""
+        return self._summary
+
+    def export_chrome_trace(self, path):
+        """Write the buffered phase events as a Chrome/Perfetto trace JSON file"""
+        events = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'Laser Defender'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'main loop'}},
+        ]
+        for r in self._rows():
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': self._frame_start[r] * 1e6, 'dur': self._frame_total[r] * 1e6})
+        count = min(self._event_count, self._event_capacity)
+        first = self._event_count - count
+        for n in range(first, self._event_count):
+            i = n % self._event_capacity
+            events.append({'name': self.phases[self._event_phase[i]], 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': self._event_start[i] * 1e6, 'dur': self._event_duration[i] * 1e6})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+class StartupTimer:
+    """Time from ``start`` (a perf_counter() value) to the first frame, by step"""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.steps = []
+
+    def mark(self, step):
+        """Charge the time since the previous mark to ``step``"""
+        now = time.perf_counter()
+        self.steps.append((step, (now - self._last) * 1000))
+        self._last = now
+
+    def total(self):
+        """Milliseconds from the start to the last mark"""
+        return (self._last - self.start) * 1000
+
+    def report(self):
+        steps = "  ".join(f"{step} {ms:.1f}" for step, ms in self.steps)
+        return f"Startup: first frame after {self.total():.1f} ms ({steps})"
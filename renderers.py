@@ -0,0 +1,157 @@
+"""Frame renderers: full-screen redraw and dirty-rectangle updates.
+
+``draw()`` talks to a renderer instead of filling and flipping the screen
+itself. Each frame it calls ``begin()`` with the HUD text for the frame,
+draws sprites straight onto the screen and reports their bounding rects
+with ``sprites()`` (only needed when ``tracks_sprites`` is set), optionally adds a full-screen ``overlay()``, and finishes
+with ``end()``, passing a callable that can draw the sprites again;
+``present()`` then puts the frame on the display.
+
+``FullRenderer`` is the classic fill-everything-and-flip loop.
+``DirtyRectRenderer`` only restores the regions sprites covered last frame
+from a cached background, redraws HUD text that changed or was touched,
+and hands the list of changed rects to ``pygame.display.update()``.
+"""
+import pygame
+
+
+class FullRenderer:
+    """Clear the whole screen every frame and flip"""
+
+    tracks_sprites = False
+
+    def __init__(self, screen, background_color):
+        self.screen = screen
+        self.background_color = background_color
+        self.dirty_percent = 100.0
+        self._texts = []
+        self._overlay = None
+
+    def begin(self, texts):
+        """Start a frame; ``texts`` is a list of (slot, surface, pos)"""
+        self.screen.fill(self.background_color)
+        self._texts = texts
+        self._overlay = None
+
+    def sprites(self, rects):
+        pass
+
+    def overlay(self, surface, texts=()):
+        self._overlay = (surface, texts)
+
+    def end(self, redraw_sprites=None):
+        blit = self.screen.blit
+        for slot, surface, pos in self._texts:
+            blit(surface, pos)
+        if self._overlay:
+            surface, texts = self._overlay
+            blit(surface, (0, 0))
+            for slot, surface, pos in texts:
+                blit(surface, pos)
+
+    def present(self):
+        pygame.display.flip()
+
+
+class DirtyRectRenderer(FullRenderer):
+    """Redraw and update only the parts of the screen that changed
+
+    HUD text that changed, vanished or was crossed by a sprite is repaired
+    by restoring the background under it and redrawing the sprites (clipped
+    to that region) and the text on top, so layering matches FullRenderer.
+    ``dirty_percent`` is the share of the screen pushed to the display in
+    the last frame.
+    """
+
+    tracks_sprites = True
+
+    def __init__(self, screen, background_color):
+        super().__init__(screen, background_color)
+        self.screen_rect = screen.get_rect()
+        self.background = pygame.Surface(self.screen_rect.size).convert()
+        self.background.fill(background_color)
+        self.full_redraw = True
+        self._dirty = []
+        self._erased = []
+        self._sprites = []
+        self._prev_sprites = []
+        self._drawn_texts = {}  # slot -> (surface, rect) on screen now
+        self._redrawing = False
+
+    def begin(self, texts):
+        self._dirty = []
+        self._erased = []
+        self._sprites = []
+        self._overlay = None
+        self._texts = texts
+
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            self._dirty.append(self.screen_rect)
+            self._drawn_texts = {}
+        else:
+            for rect in self._prev_sprites:
+                rect = rect.clip(self.screen_rect)
+                self.screen.blit(self.background, rect, rect)
+                self._erased.append(rect)
+                self._dirty.append(rect)
+
+    def sprites(self, rects):
+        if not self._redrawing:
+            self._sprites.extend(rects)
+
+    def end(self, redraw_sprites=None):
+        """Finish the frame; ``redraw_sprites`` repaints sprites under text"""
+        screen = self.screen
+        blit = screen.blit
+        texts = [(slot, surface, surface.get_rect(topleft=pos)) for slot, surface, pos in self._texts]
+        new_texts = {slot: (surface, rect) for slot, surface, rect in texts}
+
+        if self.full_redraw:
+            for slot, surface, rect in texts:
+                blit(surface, rect)
+        else:
+            # Regions where text appeared, changed, vanished or was crossed
+            touched = self._erased + self._sprites
+            regions = []
+            for slot, (surface, rect) in self._drawn_texts.items():
+                if new_texts.get(slot) != (surface, rect):
+                    regions.append(rect)
+            for slot, surface, rect in texts:
+                if self._drawn_texts.get(slot) != (surface, rect) or rect.collidelist(touched) != -1:
+                    regions.append(rect)
+
+            self._redrawing = True
+            for region in regions:
+                screen.set_clip(region)
+                blit(self.background, region, region)
+                if redraw_sprites is not None:
+                    redraw_sprites()
+                for slot, surface, rect in texts:
+                    if rect.colliderect(region):
+                        blit(surface, rect)
+                self._dirty.append(region)
+            screen.set_clip(None)
+            self._redrawing = False
+        self._drawn_texts = new_texts
+        self._dirty.extend(self._sprites)
+
+        # A full-screen overlay dirties everything, this frame and the next
+        self.full_redraw = self._overlay is not None
+        if self._overlay:
+            surface, overlay_texts = self._overlay
+            blit(surface, (0, 0))
+            for slot, surface, pos in overlay_texts:
+                blit(surface, pos)
+            self._dirty = [self.screen_rect]
+        self._prev_sprites = self._sprites
+
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        area = 0
+        for rect in self._dirty:
+            rect = rect.clip(self.screen_rect)
+            area += rect.width * rect.height
+        self.dirty_percent = min(100.0, 100.0 * area / screen_area)
+
+    def present(self):
+        pygame.display.update(self._dirty)
@@ -0,0 +1,248 @@
+"""Compact game replays and a maximum-speed headless player.
+
+A game is fully determined by its seed, its options and the input bits fed
+to each tick (the simulation runs in fixed ticks, see game_state.py), so a
+replay stores only those. Inputs are run-length encoded as varints of
+``run_length << 3 | input_bits`` and zlib-compressed; a minute of play is
+typically a few hundred bytes.
+
+File layout: a fixed little-endian header (``HEADER``), then the
+compressed runs. ``LDR2`` files add a flags byte to the ``LDR1`` header;
+``LDR1`` replays predate swept collision and are re-simulated with the
+discrete overlap test they were recorded with. The flags also say which
+entity store played the game, and replays are re-simulated with that store
+unless another one is asked for.
+
+    python replay.py play replays/*.ldr       # re-simulate, report ticks/s
+    python replay.py verify --jobs 8          # check every recorded game's score
+"""
+import os
+import sqlite3
+import struct
+import time
+import zlib
+
+from game_state import GameState, FPS, SPAWN_INTERVAL, SHOOT_DELAY
+
+MAGIC = b"LDR2"
+# magic, tick rate, seed, spawn interval, shoot delay, ticks, score, flags
+HEADER = struct.Struct("<4sHQIIIIB")
+HEADER_V1 = struct.Struct("<4sHQIIII")  # b"LDR1": no flags
+FLAG_SWEPT = 1  # Swept collision (GameState(swept=True))
+FLAG_ARRAYS = 2  # Played with the NumPy entity store (ArrayGameState)
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class Replay:
+    """A decoded replay: the game's parameters, its result and its input runs"""
+
+    def __init__(self, seed, runs, ticks, score, tick_rate=FPS,
+                 spawn_interval=SPAWN_INTERVAL, shoot_delay=SHOOT_DELAY, swept=True, arrays=False):
+        self.seed = seed
+        self.runs = runs  # [(input_bits, ticks), ...]
+        self.ticks = ticks
+        self.score = score
+        self.tick_rate = tick_rate
+        self.spawn_interval = spawn_interval
+        self.shoot_delay = shoot_delay
+        self.swept = swept
+        self.arrays = arrays
+
+    def encode(self):
+        body = bytearray()
+        for bits, count in self.runs:
+            value = count << 3 | bits
+            while value >= 0x80:
+                body.append(value & 0x7F | 0x80)
+                value >>= 7
+            body.append(value)
+        flags = (FLAG_SWEPT if self.swept else 0) | (FLAG_ARRAYS if self.arrays else 0)
+        header = HEADER.pack(MAGIC, self.tick_rate, self.seed, self.spawn_interval,
+                             self.shoot_delay, self.ticks, self.score, flags)
+        return header + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def decode(cls, data):
+        if data[:4] == MAGIC:
+            header = HEADER
+        elif data[:4] == b"LDR1":
+            header = HEADER_V1
+        else:
+            raise ReplayError("not a Laser Defender replay")
+        if len(data) < header.size:
+            raise ReplayError("truncated replay")
+        magic, tick_rate, seed, spawn_interval, shoot_delay, ticks, score, *flags = header.unpack_from(data)
+        flags = flags[0] if flags else 0
+        swept = bool(flags & FLAG_SWEPT)
+        arrays = bool(flags & FLAG_ARRAYS)
+        try:
+            body = zlib.decompress(data[header.size:])
+        except zlib.error as e:
+            raise ReplayError(f"corrupt replay: {e}") from None
+        runs = []
+        value = shift = 0
+        for byte in body:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            runs.append((value & 7, value >> 3))
+            value = shift = 0
+        if shift:
+            raise ReplayError("truncated replay")
+        return cls(seed, runs, ticks, score, tick_rate, spawn_interval, shoot_delay, swept, arrays)
+
+
+class ReplayRecorder:
+    """Collects the input bits of each tick of the game being played"""
+
+    def __init__(self):
+        self.state = None
+        self.runs = []
+
+    def start(self, state):
+        """Begin a new recording for a freshly reset ``state``"""
+        self.state = state
+        self.runs = []
+
+    def record(self, inputs):
+        """Call with the input bits of every ``step()``"""
+        runs = self.runs
+        if runs and runs[-1][0] == inputs:
+            runs[-1][1] += 1
+        else:
+            runs.append([inputs, 1])
+
+    def replay(self):
+        """The game so far as a Replay"""
+        state = self.state
+        return Replay(state.seed, [tuple(run) for run in self.runs], state.ticks, state.score,
+                      FPS, state.spawn_interval, state.shoot_delay, state.swept, state.arrays)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return Replay.decode(f.read())
+
+
+def store(arrays):
+    """The GameState class of an entity store"""
+    if arrays:
+        from entity_store import ArrayGameState
+        return ArrayGameState
+    return GameState
+
+
+def simulate(replay, state_class=None):
+    """Re-run a replay without rendering and return the final state
+
+    It runs on the entity store it was recorded with, unless ``state_class``
+    says otherwise.
+    """
+    if state_class is None:
+        state_class = store(replay.arrays)
+    if replay.tick_rate != FPS:
+        raise ReplayError(f"recorded at {replay.tick_rate} ticks/s, this build runs {FPS}")
+    state = state_class(replay.seed, spawn_interval=replay.spawn_interval, shoot_delay=replay.shoot_delay,
+                        swept=replay.swept)
+    step = state.step
+    dt = 1000 / replay.tick_rate
+    for bits, count in replay.runs:
+        for _ in range(count):
+            step(bits, dt)
+    return state
+
+
+def check(replay, expected_score, state_class=None):
+    """Simulate a replay; return None if it reproduces ``expected_score``, else the problem"""
+    state = simulate(replay, state_class)
+    if state.ticks != replay.ticks:
+        return f"ended after {state.ticks} ticks, recorded {replay.ticks}"
+    if state.score != expected_score:
+        return f"replays to score {state.score}, recorded {expected_score}"
+    return None
+
+
+def _verify_game(job):
+    game_id, score, path, arrays = job
+    state_class = store(True) if arrays else None
+    try:
+        replay = load(path)
+        return game_id, check(replay, score, state_class), replay.ticks
+    except (OSError, ReplayError) as e:
+        return game_id, str(e), 0
+
+
+def verify_history(db_path, jobs=1, arrays=False):
+    """Re-simulate every game in a history database that has a replay
+
+    Returns (games checked, ticks simulated, [(game id, problem), ...]).
+    Relative replay paths are taken from the database's directory. Each
+    game is simulated with the entity store it was played with, or with
+    ``ArrayGameState`` for all of them if ``arrays`` is set.
+    """
+    from high_scores import GameHistory
+
+    conn = sqlite3.connect(db_path)
+    try:
+        GameHistory.migrate(conn)
+        rows = conn.execute("SELECT id, score, replay FROM games WHERE replay IS NOT NULL ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    base = os.path.dirname(os.path.abspath(db_path))
+    work = [(game_id, score, os.path.join(base, path), arrays) for game_id, score, path in rows]
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_verify_game, work, chunksize=max(1, len(work) // (jobs * 4))))
+    else:
+        results = [_verify_game(job) for job in work]
+    problems = [(game_id, problem) for game_id, problem, _ in results if problem]
+    return len(results), sum(ticks for _, _, ticks in results), problems
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from high_scores import HISTORY_DB
+
+    parser = argparse.ArgumentParser(description="Play back and verify Laser Defender replays")
+    parser.add_argument("--arrays", action="store_true",
+                        help="simulate every replay with the NumPy entity store "
+                             "(default: the store each game was played with)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("play", help="re-simulate replay files and report their results")
+    play.add_argument("files", nargs="+")
+    verify = commands.add_parser("verify", help="check every game in the history against its replay")
+    verify.add_argument("--db", default=HISTORY_DB)
+    verify.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "play":
+        state_class = store(True) if args.arrays else None
+        total_ticks = 0
+        for path in args.files:
+            try:
+                replay = load(path)
+            except (OSError, ReplayError) as e:
+                print(f"{path}: {e}")
+                continue
+            state = simulate(replay, state_class)
+            total_ticks += state.ticks
+            status = "ok" if (state.score, state.ticks) == (replay.score, replay.ticks) else "MISMATCH"
+            print(f"{path}: seed {replay.seed}, score {state.score} in {state.ticks} ticks "
+                  f"({os.path.getsize(path)} bytes) {status}")
+        games = len(args.files)
+    else:
+        games, total_ticks, problems = verify_history(args.db, args.jobs, args.arrays)
+        for game_id, problem in problems:
+            print(f"game {game_id}: {problem}")
+        print(f"{games} games checked, {len(problems)} mismatched")
+    elapsed = time.perf_counter() - start
+    print(f"{games} replays, {total_ticks} ticks in {elapsed:.2f}s ({total_ticks / max(elapsed, 1e-9):,.0f} ticks/s)")
+    if args.command == "verify" and problems:
+        raise SystemExit(1)
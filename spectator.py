@@ -0,0 +1,467 @@
+"""Live game streaming to spectators over TCP and WebSocket.
+
+``SpectatorServer`` runs an asyncio server on its own thread. The game calls
+``publish(state)`` once per frame. That copies the positions into a
+``Snapshot`` and wakes the server thread, so the game loop never waits on
+the network. If the server falls behind, snapshots coalesce and only the
+newest is sent.
+
+Messages are binary and little-endian. Each starts with ``HEADER``: kind,
+tick, score, paddle x, game over. A keyframe then lists the lasers and
+the targets, each as a uint16 count followed by int16 (x, y) pairs. A
+delta is relative to the previous message. For lasers and then targets,
+it gives a uint16 count and the uint16 indices to drop, then the points
+to append. Spectators first move every laser and target by its speed
+times the ticks elapsed, so a typical tick is about 20 bytes. Each message
+is encoded once and shared by all spectators. A spectator whose socket
+buffer passes ``max_buffer`` bytes has messages dropped, and gets a
+keyframe once it has caught up.
+
+Raw TCP spectators send ``SPECTATE\\n`` and receive messages prefixed with
+their length (4 bytes). WebSocket spectators (``GET`` with an Upgrade
+header) receive one binary frame per message.
+
+    python laser_defender.py --spectate 8765
+    python spectator.py watch --port 8765
+    python spectator.py loadtest --clients 300
+"""
+import asyncio
+import base64
+import hashlib
+import struct
+import threading
+from collections import namedtuple
+
+from game_state import LASER_SPEED, TARGET_SPEED
+
+DEFAULT_PORT = 8765
+KEYFRAME, DELTA = 0, 1
+# kind, tick, score, paddle x, game over
+HEADER = struct.Struct("<BIIhB")
+COUNT = struct.Struct("<H")
+LENGTH = struct.Struct("<I")
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+Snapshot = namedtuple('Snapshot', 'tick score paddle_x lasers targets game_over')
+
+
+def capture(state):
+    """Snapshot of a GameState (lasers and targets as (x, y) tuples)"""
+    return Snapshot(state.ticks, state.score, state.paddle.x,
+                    [(laser.x, laser.y) for laser in state.lasers],
+                    [tuple(target) for target in state.targets], state.game_over)
+
+
+def _pack_points(points):
+    flat = [v for point in points for v in point]
+    return COUNT.pack(len(points)) + struct.pack(f"<{len(flat)}h", *flat)
+
+
+def _unpack_points(data, offset):
+    (n,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    flat = struct.unpack_from(f"<{2 * n}h", data, offset)
+    return list(zip(flat[::2], flat[1::2])), offset + 4 * n
+
+
+def _predict(points, dy):
+    return [(x, y + dy) for x, y in points] if dy else points
+
+
+def _diff(predicted, current):
+    """Indices of ``predicted`` to drop and points to append to get ``current``"""
+    removed = []
+    added = []
+    j = 0
+    n = len(predicted)
+    for point in current:
+        while j < n and predicted[j] != point:
+            removed.append(j)
+            j += 1
+        if j < n:
+            j += 1
+        else:
+            added.append(point)
+    removed.extend(range(j, n))
+    return removed, added
+
+
+def encode_keyframe(snapshot):
+    return (HEADER.pack(KEYFRAME, snapshot.tick, snapshot.score, snapshot.paddle_x, snapshot.game_over)
+            + _pack_points(snapshot.lasers) + _pack_points(snapshot.targets))
+
+
+def encode_delta(previous, snapshot):
+    """Changes from ``previous`` to ``snapshot``, or None if a keyframe is needed"""
+    ticks = snapshot.tick - previous.tick
+    if ticks < 0:
+        return None  # A new game
+    parts = [HEADER.pack(DELTA, snapshot.tick, snapshot.score, snapshot.paddle_x, snapshot.game_over)]
+    for points, current, speed in ((previous.lasers, snapshot.lasers, -LASER_SPEED),
+                                   (previous.targets, snapshot.targets, TARGET_SPEED)):
+        removed, added = _diff(_predict(points, speed * ticks), current)
+        parts.append(COUNT.pack(len(removed)) + struct.pack(f"<{len(removed)}H", *removed))
+        parts.append(_pack_points(added))
+    return b"".join(parts)
+
+
+def decode(data, previous=None):
+    """Apply a message to the ``previous`` snapshot and return the new one"""
+    kind, tick, score, paddle_x, game_over = HEADER.unpack_from(data)
+    offset = HEADER.size
+    if kind == KEYFRAME:
+        lasers, offset = _unpack_points(data, offset)
+        targets, offset = _unpack_points(data, offset)
+        return Snapshot(tick, score, paddle_x, lasers, targets, bool(game_over))
+    if previous is None:
+        raise ValueError("delta without a keyframe")
+    ticks = tick - previous.tick
+    result = []
+    for points, speed in ((previous.lasers, -LASER_SPEED), (previous.targets, TARGET_SPEED)):
+        (n,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        removed = set(struct.unpack_from(f"<{n}H", data, offset))
+        offset += 2 * n
+        added, offset = _unpack_points(data, offset)
+        kept = [point for i, point in enumerate(_predict(points, speed * ticks)) if i not in removed]
+        result.append(kept + added)
+    return Snapshot(tick, score, paddle_x, result[0], result[1], bool(game_over))
+
+
+def ws_frame(payload):
+    """A single unmasked binary WebSocket frame"""
+    n = len(payload)
+    if n < 126:
+        return struct.pack("!BB", 0x82, n) + payload
+    if n < 65536:
+        return struct.pack("!BBH", 0x82, 126, n) + payload
+    return struct.pack("!BBQ", 0x82, 127, n) + payload
+
+
+class _Spectator:
+    def __init__(self, writer, websocket):
+        self.writer = writer
+        self.websocket = websocket
+        self.needs_keyframe = True
+
+
+class SpectatorServer:
+    """Streams published snapshots to every connected spectator"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, max_buffer=64 * 1024):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer
+        self.spectators = set()
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._latest = None
+        self._scheduled = False
+        self._previous = None
+        self._published_key = None
+        self._resync = False  # Somebody is waiting for a keyframe
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._error = None
+        self._handlers = {}  # connection task: its writer
+
+    def start(self):
+        """Start serving on a background thread; returns once it is listening"""
+        self._thread = threading.Thread(target=self._run, name="spectator server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._loop is None:
+            raise OSError(f"could not listen on {self.host}:{self.port}: {self._error}")
+        return self
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join()
+            self._loop = None
+
+    def publish(self, state):
+        """Queue the state for spectators; cheap, and free with nobody watching"""
+        if not self.spectators:
+            return
+        key = (state.seed, state.ticks, state.game_over)
+        if key == self._published_key and not self._resync:
+            return
+        self._published_key = key
+        snapshot = capture(state)
+        with self._lock:
+            self._latest = snapshot
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._broadcast)
+
+    # -- server thread ---------------------------------------------------
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._serve(loop))
+        except OSError as e:
+            self._error = e
+        finally:
+            self._ready.set()
+            loop.close()
+
+    async def _serve(self, loop):
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = loop
+        self._ready.set()
+        async with server:
+            await self._stop.wait()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            await self._spectate(reader, writer)
+        finally:
+            del self._handlers[task]
+            writer.close()
+
+    async def _spectate(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            websocket = request.startswith(b"GET ")
+            if websocket:
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), 5)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                key = headers.get("sec-websocket-key")
+                if key is None:
+                    return
+                accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+                writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                              f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            elif request.strip() != b"SPECTATE":
+                return
+        except (asyncio.TimeoutError, ConnectionError):
+            return
+
+        spectator = _Spectator(writer, websocket)
+        self.spectators.add(spectator)
+        self._resync = True
+        try:
+            # Nothing is expected from spectators; wait for them to hang up
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.spectators.discard(spectator)
+
+    def _broadcast(self):
+        with self._lock:
+            snapshot = self._latest
+            self._scheduled = False
+        previous = self._previous
+        self._previous = snapshot
+        delta = encode_delta(previous, snapshot) if previous is not None else None
+        framed = {}  # Each message is encoded and framed once for everybody
+        resync = False
+        for spectator in list(self.spectators):
+            transport = spectator.writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > self.max_buffer:
+                # Slow spectator: skip this message, resync with a keyframe later
+                spectator.needs_keyframe = True
+                self.messages_dropped += 1
+                resync = True
+                continue
+            keyframe = spectator.needs_keyframe or delta is None
+            cache_key = (keyframe, spectator.websocket)
+            data = framed.get(cache_key)
+            if data is None:
+                payload = encode_keyframe(snapshot) if keyframe else delta
+                data = framed[cache_key] = ws_frame(payload) if spectator.websocket else LENGTH.pack(len(payload)) + payload
+            spectator.needs_keyframe = False
+            transport.write(data)
+            self.messages_sent += 1
+            self.bytes_sent += len(data)
+        self._resync = resync
+
+
+def read_messages(sock):
+    """Yield the payloads of a raw TCP stream from a connected socket"""
+    buffer = bytearray()
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return
+        buffer += chunk
+        while len(buffer) >= LENGTH.size:
+            (n,) = LENGTH.unpack_from(buffer)
+            if len(buffer) < LENGTH.size + n:
+                break
+            yield bytes(buffer[LENGTH.size:LENGTH.size + n])
+            del buffer[:LENGTH.size + n]
+
+
+def watch(host, port):
+    """Open a window showing the stream from a spectator server"""
+    import socket
+
+    import pygame
+
+    from game_state import WIDTH, HEIGHT, FPS, PADDLE_WIDTH, PADDLE_HEIGHT
+    from laser_defender import BLACK, BLUE, GREEN, RED, WHITE
+    from sprites import SpriteAtlas
+
+    sock = socket.create_connection((host, port))
+    sock.sendall(b"SPECTATE\n")
+    latest = [None]
+
+    def receive():
+        snapshot = None
+        for message in read_messages(sock):
+            snapshot = decode(message, snapshot)
+            latest[0] = snapshot
+        latest[0] = None
+
+    threading.Thread(target=receive, name="spectator client", daemon=True).start()
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Laser Defender - watching {host}:{port}")
+    font = pygame.font.Font(None, 36)
+    atlas = SpriteAtlas(GREEN, RED, BLUE)
+    atlas.build(1)
+    clock = pygame.time.Clock()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sock.close()
+                pygame.quit()
+                return
+        snapshot = latest[0]
+        screen.fill(BLACK)
+        if snapshot is not None:
+            paddle = pygame.Rect(snapshot.paddle_x, HEIGHT - 50, PADDLE_WIDTH, PADDLE_HEIGHT)
+            lasers = [pygame.Rect(x, y, 0, 0) for x, y in snapshot.lasers]
+            screen.blits(atlas.batch(paddle, lasers, snapshot.targets), doreturn=False)
+            status = f"Score: {snapshot.score}" + ("  (game over)" if snapshot.game_over else "")
+        else:
+            status = "Waiting for the game..."
+        screen.blit(font.render(status, True, WHITE), (10, 10))
+        pygame.display.flip()
+        clock.tick(FPS)
+
+
+def _load_clients(host, port, clients, seconds, results):
+    """Load-test process: many raw TCP spectators that count what they receive"""
+    import time
+
+    async def spectator(index, totals):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"SPECTATE\n")
+        snapshot = None
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                header = await asyncio.wait_for(reader.readexactly(LENGTH.size), 5)
+                message = await reader.readexactly(LENGTH.unpack(header)[0])
+                totals['messages'] += 1
+                totals['bytes'] += LENGTH.size + len(message)
+                if index == 0:
+                    snapshot = decode(message, snapshot)  # One spectator checks the stream decodes
+                    totals['decoded'] += 1
+        finally:
+            writer.close()
+
+    async def run():
+        totals = {'messages': 0, 'bytes': 0, 'decoded': 0}
+        await asyncio.gather(*(spectator(i, totals) for i in range(clients)))
+        return totals
+
+    results.put(asyncio.run(run()))
+
+
+def load_test(clients, seconds, spawn_interval=100):
+    """Run a 60 Hz headless game with and without ``clients`` spectators"""
+    import multiprocessing
+    import os
+    import time
+
+    from game_state import GameState, TICK_MS, autopilot
+
+    server = SpectatorServer(port=0).start()
+    state = GameState(seed=0, spawn_interval=spawn_interval)
+
+    def play(duration):
+        # Wall time includes being preempted by the server thread and the
+        # spectators; thread CPU time is the game thread's own work
+        wall = []
+        cpu = []
+        next_tick = time.perf_counter()
+        end = next_tick + duration
+        while next_tick < end:
+            start = time.perf_counter()
+            start_cpu = time.thread_time()
+            if state.game_over:
+                state.reset()
+            state.step(autopilot(state), TICK_MS)
+            server.publish(state)
+            cpu.append((time.thread_time() - start_cpu) * 1000)
+            wall.append((time.perf_counter() - start) * 1000)
+            next_tick += TICK_MS / 1000
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return [(times[len(times) // 2], times[int(len(times) * 0.99)]) for times in (sorted(cpu), sorted(wall))]
+
+    alone = play(seconds)
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_load_clients, args=(server.host, server.port, clients, seconds, results))
+    process.start()
+    while len(server.spectators) < clients and process.is_alive():
+        state.step(autopilot(state), TICK_MS)
+        time.sleep(0.01)
+    watched = play(seconds)
+    totals = results.get()
+    process.join()
+    server.close()
+
+    print(f"{os.cpu_count()} CPUs")
+    for label, (cpu, wall) in (("without spectators", alone), (f"with {clients} spectators", watched)):
+        print(f"tick {label}: CPU p50 {cpu[0]:.3f} ms, p99 {cpu[1]:.3f} ms; "
+              f"wall p50 {wall[0]:.3f} ms, p99 {wall[1]:.3f} ms")
+    print(f"{totals['messages']:,} messages, {totals['bytes'] / max(totals['messages'], 1):.1f} bytes each, "
+          f"{server.messages_dropped} dropped, {totals['decoded']} decoded by spectator 0")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Laser Defender spectator client and load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+    watch_parser = commands.add_parser("watch", help="show a live game")
+    watch_parser.add_argument("--host", default="127.0.0.1")
+    watch_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser = commands.add_parser("loadtest", help="measure tick time with many spectators")
+    load_parser.add_argument("--clients", type=int, default=300)
+    load_parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.command == "watch":
+        watch(args.host, args.port)
+    else:
+        load_test(args.clients, args.seconds)
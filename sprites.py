@@ -0,0 +1,122 @@
+"""Laser styles and the pre-rendered sprite atlas.
+
+Drawing a laser with ``pygame.draw`` costs one to three draw calls that
+depend on the style. ``SpriteAtlas`` rasterizes the current laser style,
+the target circle and the paddle once into a single surface, so a frame
+becomes one ``Surface.blits()`` call of cheap copies. The atlas is only
+rebuilt when the laser style changes.
+
+``pygame.draw`` leaves every atlas pixel fully opaque or fully clear, so the
+atlas is normally stored with a colorkey and RLE acceleration, which blits
+the same pixels about three times faster than per-pixel alpha.
+"""
+import pygame
+
+from game_state import PADDLE_WIDTH, PADDLE_HEIGHT, LASER_WIDTH, LASER_HEIGHT, TARGET_RADIUS
+
+# Room around the laser rect for styles whose lines are wider than the rect
+LASER_PAD = 8
+# Transparent colour of the colorkeyed atlas; never used by a sprite
+ATLAS_KEY = (255, 0, 255)
+
+
+def draw_laser(surface, laser, style, color):
+    """Render a laser rect using the chosen visual style and return the area it covered."""
+    if style == 1:
+        # Classic rectangle, sharp edges
+        return pygame.draw.rect(surface, color, laser, border_radius=0)
+
+    elif style == 2:
+        # Thick line beam centered on the rect
+        return pygame.draw.line(surface, color, (laser.centerx, laser.bottom), (laser.centerx, laser.top), 6)
+
+    elif style == 3:
+        # Glowing beam: thicker dim outer, bright inner
+        area = pygame.draw.line(surface, (0, 150, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 12)
+        pygame.draw.line(surface, (0, 255, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 6)
+        return area
+
+    elif style == 4:
+        # Rounded "capsule" laser using border_radius
+        return pygame.draw.rect(surface, color, laser, border_radius=min(laser.width, laser.height) // 2)
+
+    elif style == 5:
+        # Neon-ish stacked lines (fake gradient) - made thicker
+        area = pygame.draw.line(surface, (0, 255, 0), (laser.centerx, laser.bottom), (laser.centerx, laser.top), 8)
+        area.union_ip(pygame.draw.line(surface, (0, 200, 100), (laser.centerx - 2, laser.bottom), (laser.centerx - 2, laser.top), 4))
+        area.union_ip(pygame.draw.line(surface, (0, 100, 255), (laser.centerx + 2, laser.bottom), (laser.centerx + 2, laser.top), 4))
+        return area
+    else:
+        # Fallback
+        return pygame.draw.rect(surface, color, laser, border_radius=0)
+
+
+class SpriteAtlas:
+    """One alpha surface holding the paddle, target and current laser sprites"""
+
+    def __init__(self, laser_color, target_color, paddle_color):
+        self.laser_color = laser_color
+        self.target_color = target_color
+        self.paddle_color = paddle_color
+        self.style = None
+        self.surface = None
+
+    def build(self, style):
+        """Rasterize every sprite for this laser style"""
+        # Draw the laser with padding, then trim to the pixels it touched
+        scratch = pygame.Surface((LASER_WIDTH + 2 * LASER_PAD, LASER_HEIGHT + 2 * LASER_PAD), pygame.SRCALPHA)
+        draw_laser(scratch, pygame.Rect(LASER_PAD, LASER_PAD, LASER_WIDTH, LASER_HEIGHT), style, self.laser_color)
+        laser_bounds = scratch.get_bounding_rect()
+
+        target_size = TARGET_RADIUS * 2 + 1
+        width = PADDLE_WIDTH + target_size + laser_bounds.width
+        height = max(PADDLE_HEIGHT, target_size, laser_bounds.height)
+        atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+
+        self.paddle_area = pygame.Rect(0, 0, PADDLE_WIDTH, PADDLE_HEIGHT)
+        atlas.fill(self.paddle_color, self.paddle_area)
+
+        self.target_area = pygame.Rect(PADDLE_WIDTH, 0, target_size, target_size)
+        pygame.draw.circle(atlas, self.target_color, self.target_area.center, TARGET_RADIUS)
+
+        self.laser_area = pygame.Rect(self.target_area.right, 0, laser_bounds.width, laser_bounds.height)
+        atlas.blit(scratch, self.laser_area, laser_bounds)
+        # Where the sprite sits relative to the laser rect's top-left corner
+        self.laser_offset = (laser_bounds.x - LASER_PAD, laser_bounds.y - LASER_PAD)
+
+        self.surface = self._colorkeyed(atlas) or atlas.convert_alpha()
+        self.style = style
+
+    @staticmethod
+    def _colorkeyed(atlas):
+        """RLE colorkey copy of an alpha surface, or None if it has partial alpha"""
+        visible = pygame.mask.from_surface(atlas, 0).count()
+        if pygame.mask.from_surface(atlas, 254).count() != visible:
+            return None
+        if pygame.mask.from_threshold(atlas, ATLAS_KEY + (255,), (1, 1, 1, 255)).count():
+            return None
+        surface = pygame.Surface(atlas.get_size())
+        surface.fill(ATLAS_KEY)
+        surface.blit(atlas, (0, 0))
+        surface = surface.convert()
+        surface.set_colorkey(ATLAS_KEY, pygame.RLEACCEL)
+        return surface
+
+    def batch(self, paddle, lasers, targets, laser_dy=0, target_dy=0):
+        """Blit sequence for ``Surface.blits()`` covering every sprite
+
+        ``laser_dy`` and ``target_dy`` shift every laser or target vertically
+        (used to interpolate between simulation ticks).
+        """
+        atlas = self.surface
+        sequence = [(atlas, paddle.topleft, self.paddle_area)]
+
+        laser_area = self.laser_area
+        ox, oy = self.laser_offset
+        oy += laser_dy
+        sequence.extend([(atlas, (laser.x + ox, laser.y + oy), laser_area) for laser in lasers])
+
+        target_area = self.target_area
+        top = TARGET_RADIUS - target_dy
+        sequence.extend([(atlas, (tx - TARGET_RADIUS, ty - top), target_area) for tx, ty in targets])
+        return sequence
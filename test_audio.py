@@ -0,0 +1,35 @@
+"""Sound synthesis gives the same PCM with or without numpy"""
+import array
+
+import pytest
+
+import audio
+
+
+def test_python_synthesis_without_numpy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audio, "have_numpy", lambda: False)
+    audio.pcm_bytes.cache_clear()
+    try:
+        data = audio.pcm_bytes('shoot', 22050, -16, 2)
+    finally:
+        audio.pcm_bytes.cache_clear()
+    samples = array.array('h', data)
+    assert len(samples) == 2 * int(22050 * 0.1)
+    assert samples[0::2] == samples[1::2]
+    assert 0 < max(samples) <= 32767 * 0.5 + 1
+
+
+@pytest.mark.parametrize("name", sorted(audio.SOUND_SPECS))
+@pytest.mark.parametrize("sample_format", [8, -8, 16, -16, 32, -32])
+def test_numpy_and_python_paths_agree(name, sample_format):
+    pytest.importorskip("numpy")
+    spec = audio.SOUND_SPECS[name]
+    wave = audio.synthesize(spec, 22050)
+    fallback = audio._synthesize_python(spec, 22050, len(wave))
+    typecode = audio.PCM_TYPECODES[sample_format]
+    fast = array.array(typecode, audio.to_pcm(wave, sample_format, 1))
+    slow = array.array(typecode, audio.to_pcm(fallback, sample_format, 1))
+    assert len(fast) == len(slow) == len(wave)
+    scale = 1.0 if sample_format == 32 else 2 ** (abs(sample_format) - 1)
+    assert max(abs(a - b) for a, b in zip(fast, slow)) <= 1e-6 * scale + 1
@@ -0,0 +1,39 @@
+"""ArrayGameState must play exactly the same games as GameState"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pytest
+
+from game_state import GameState, autopilot
+
+np = pytest.importorskip("numpy")
+from entity_store import ArrayGameState, EntityArrays
+
+
+def test_remove_keeps_spawn_order():
+    arrays = EntityArrays(('x', 'y'), capacity=2)
+    for i in range(10):
+        arrays.append(i, -i)
+    arrays.remove(np.array([7, 0, 3, 9]))
+    assert arrays['x'].tolist() == [1, 2, 4, 5, 6, 8]
+    assert arrays['y'].tolist() == [-1, -2, -4, -5, -6, -8]
+
+
+@pytest.mark.parametrize("swept", [True, False])
+@pytest.mark.parametrize("spawn_interval, shoot_delay", [(1000, 300), (100, 50), (30, 20)])
+def test_stores_play_the_same_game(swept, spawn_interval, shoot_delay):
+    for seed in range(8):
+        states = [state_class(seed, spawn_interval=spawn_interval, shoot_delay=shoot_delay, swept=swept)
+                  for state_class in (GameState, ArrayGameState)]
+        reference, arrays = states
+        while not reference.game_over and reference.ticks < 3000:
+            inputs = autopilot(reference)
+            assert autopilot(arrays) == inputs
+            events = [state.step(inputs, reference.dt) for state in states]
+            assert events[0] == events[1], f"seed {seed}, tick {reference.ticks}"
+            assert reference.hits == arrays.hits
+            assert reference.targets == arrays.targets
+            assert reference.lasers == arrays.lasers
+        assert (reference.score, reference.ticks, reference.game_over) == \
+               (arrays.score, arrays.ticks, arrays.game_over)
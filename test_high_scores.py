@@ -0,0 +1,87 @@
+"""HighScoreManager and GameHistory: table, statistics and shared history"""
+import os
+import sqlite3
+import stat
+import subprocess
+import sys
+
+from high_scores import BUSY_TIMEOUT, GameHistory, HighScoreManager, MAX_HIGH_SCORES
+
+
+def test_version_changes_for_games_outside_the_table(tmp_path):
+    manager = HighScoreManager(str(tmp_path / "history.db"), str(tmp_path / "high_scores.json"),
+                               str(tmp_path / "replays"))
+    try:
+        for score in range(100, 100 + MAX_HIGH_SCORES):
+            assert manager.add_score(score)
+        table = list(manager.high_scores)
+        version = manager.version
+        assert not manager.add_score(1)
+        assert manager.high_scores == table
+        assert manager.version != version
+        assert manager.get_statistics()['total_games'] == MAX_HIGH_SCORES + 1
+    finally:
+        manager.close()
+
+
+WRITE_GAME = """
+import os, sys
+sys.path.insert(0, {repo!r})
+os.umask(0o022)
+from high_scores import GameHistory
+history = GameHistory("history.db", "replays")
+history.append({{'score': 7, 'player': 'Other', 'date': '2024-01-01 00:00', 'laser_style': 2}}, b"LDR2 replay")
+history.close()
+"""
+
+
+def test_replay_from_another_process_is_readable(tmp_path):
+    repo = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, "-c", WRITE_GAME.format(repo=repo)], cwd=tmp_path, check=True)
+
+    history = GameHistory(str(tmp_path / "history.db"), str(tmp_path / "replays"))
+    try:
+        clears, games = history.poll(0)
+        assert [game['score'] for game in games] == [7]
+        (path,) = history._conn.execute("SELECT replay FROM games WHERE id = ?", (games[0]['id'],)).fetchone()
+    finally:
+        history.close()
+    replay_path = tmp_path / path
+    assert replay_path.read_bytes() == b"LDR2 replay"
+    if os.name == 'posix':
+        # Cabinets running as other users must be able to read it too
+        assert stat.S_IMODE(os.stat(replay_path).st_mode) == 0o644
+
+
+class BusyConnection:
+    """A connection whose reads fail as if another process held the database"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.busy = True
+
+    def execute(self, sql, *args):
+        if self.busy and sql.startswith("SELECT"):
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.execute(sql, *args)
+
+
+def test_poll_treats_a_busy_database_as_no_change(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = GameHistory(path, str(tmp_path / "replays"))
+    try:
+        history.load(MAX_HIGH_SCORES)
+        other = sqlite3.connect(path)
+        with other:
+            other.execute("INSERT INTO games (score, player, date, laser_style) VALUES (5, 'Other', '', 1)")
+        other.close()
+        conn = history._conn
+        history._conn = BusyConnection(conn)
+        assert history.poll(0) is None
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == BUSY_TIMEOUT * 1000
+        history._conn.busy = False
+        clears, games = history.poll(0)  # The same games, once the database is free
+        assert [game['score'] for game in games] == [5]
+        history._conn = conn
+    finally:
+        history.close()
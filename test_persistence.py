@@ -0,0 +1,34 @@
+"""atomic_write replaces files completely and keeps their permissions"""
+import os
+import stat
+
+import pytest
+
+from persistence import atomic_write
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason="POSIX permission bits")
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_save_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "high_scores.json"
+    path.write_bytes(b"[]")
+    for wanted in (0o644, 0o640):
+        os.chmod(path, wanted)
+        atomic_write(str(path), b"[1]")
+        assert path.read_bytes() == b"[1]"
+        assert mode(path) == wanted
+
+
+def test_new_file_follows_the_umask(tmp_path):
+    path = tmp_path / "new.json"
+    old = os.umask(0o022)
+    try:
+        atomic_write(str(path), b"{}")
+    finally:
+        os.umask(old)
+    assert mode(path) == 0o644
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
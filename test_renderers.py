@@ -0,0 +1,62 @@
+"""DirtyRectRenderer must produce the same pixels as FullRenderer"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import pytest
+
+from game_state import WIDTH, HEIGHT
+from renderers import FullRenderer, DirtyRectRenderer
+
+np = pytest.importorskip("numpy")
+from particles import ParticleSystem, TRAIL
+
+BLACK = (0, 0, 0)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    pygame.display.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    yield
+    pygame.display.quit()
+
+
+def hud(frame):
+    """Two text-like blocks; the second changes every few frames"""
+    score = pygame.Surface((200, 30))
+    score.fill((255, 255, 255))
+    status = pygame.Surface((120 + 10 * (frame // 7 % 3), 30))
+    status.fill((255, 215, 0))
+    return [('score', score, (10, 10)), ('status', status, (10, 80))]
+
+
+@pytest.mark.parametrize("mode", ["pixels", "blits"])
+def test_dirty_rects_match_full_redraw_with_particles(mode):
+    screens = {}
+    for renderer_class in (FullRenderer, DirtyRectRenderer):
+        screen = pygame.Surface((WIDTH, HEIGHT), 0, 32)
+        renderer = renderer_class(screen, BLACK)
+        particles = ParticleSystem(seed=1)
+        rng = np.random.default_rng(2)
+        frames = []
+
+        def draw_sprites():
+            renderer.sprites(particles.draw(screen, mode=mode))
+
+        for frame in range(120):
+            # Explosions and trails over and around the HUD text
+            if frame % 10 == 0:
+                particles.explosion(int(rng.integers(20, 300)), int(rng.integers(10, 120)))
+            particles.emit_points(rng.integers(0, 300, 5), rng.integers(0, 120, 5), 0, 1, 10, TRAIL)
+            renderer.begin(hud(frame))
+            draw_sprites()
+            renderer.end(draw_sprites)
+            frames.append(pygame.image.tobytes(screen, "RGB"))
+            particles.update()
+        screens[renderer_class] = frames
+
+    for frame, (full, dirty) in enumerate(zip(screens[FullRenderer], screens[DirtyRectRenderer])):
+        assert full == dirty, f"frame {frame} differs"
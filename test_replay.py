@@ -0,0 +1,38 @@
+"""Replays record their game's options and re-simulate with them"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pytest
+
+from game_state import GameState, autopilot
+from replay import Replay, ReplayRecorder, check, simulate
+
+
+def play(state_class):
+    state = state_class(3, spawn_interval=100, shoot_delay=50)
+    recorder = ReplayRecorder()
+    recorder.start(state)
+    while not state.game_over:
+        inputs = autopilot(state)
+        recorder.record(inputs)
+        state.step(inputs, state.dt)
+    return state, Replay.decode(recorder.replay().encode())
+
+
+def test_replay_reproduces_game():
+    state, replay = play(GameState)
+    assert not replay.arrays
+    assert type(simulate(replay)) is GameState
+    assert check(replay, state.score) is None
+
+
+def test_replay_records_entity_store():
+    pytest.importorskip("numpy")
+    from entity_store import ArrayGameState
+
+    state, replay = play(ArrayGameState)
+    assert replay.arrays
+    assert type(simulate(replay)) is ArrayGameState
+    assert check(replay, state.score) is None
+    assert check(replay, state.score, GameState) is None
@@ -0,0 +1,43 @@
+"""Cache of rendered text surfaces.
+
+Rasterizing text is the most expensive thing the HUD does, yet the strings
+rarely change between frames. ``TextCache.render()`` returns the same
+surface for the same (font, text, colour, antialias) until it is evicted.
+Entries are kept in least-recently-used order and evicted once the pixel
+memory of all cached surfaces goes over ``max_bytes``.
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, font, text, antialias, color):
+        """Same as ``font.render(text, antialias, color)``, but cached"""
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        self.bytes_used += surface.get_pitch() * surface.get_height()
+        while self.bytes_used > self.max_bytes and len(self._surfaces) > 1:
+            _, evicted = self._surfaces.popitem(last=False)
+            self.bytes_used -= evicted.get_pitch() * evicted.get_height()
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes_used = 0
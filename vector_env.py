@@ -0,0 +1,232 @@
+"""Step many headless games at once for training automated players.
+
+``VectorEnv`` runs ``num_envs`` independent ``GameState`` instances, split
+into contiguous slices over ``workers`` processes. Actions (input bits),
+observations, rewards and done flags live in shared-memory arrays that the
+processes map as NumPy views, so a step sends one short command per worker
+over a pipe and nothing is pickled. ``workers=0`` steps every game in the
+calling process instead, for debugging.
+
+Each observation row is float32 and laid out as::
+
+    [paddle_x, score, n_targets, n_lasers,
+     target_x, target_y  * MAX_TARGETS  (lowest on screen first),
+     laser_x, laser_y    * MAX_LASERS   (newest first)]
+
+with unused slots zero. The reward is the score gained during the step.
+A game that ends (or reaches ``max_ticks``) sets its done flag, and it is
+reset with a fresh seed before the next step. Its final score is kept in
+``final_scores``.
+
+    python vector_env.py --envs 32 --workers 0 1 2 4   # steps/s per worker count
+"""
+import multiprocessing
+import random
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from game_state import GameState, TICK_MS
+
+MAX_TARGETS = 16
+MAX_LASERS = 32
+OBS_HEADER = 4
+OBS_SIZE = OBS_HEADER + 2 * MAX_TARGETS + 2 * MAX_LASERS
+
+
+def _views(buffers, num_envs):
+    """NumPy views over the shared buffers"""
+    obs, actions, rewards, dones, final_scores = buffers
+    return (
+        np.frombuffer(obs, dtype=np.float32).reshape(num_envs, OBS_SIZE),
+        np.frombuffer(actions, dtype=np.int8),
+        np.frombuffer(rewards, dtype=np.float32),
+        np.frombuffer(dones, dtype=np.int8),
+        np.frombuffer(final_scores, dtype=np.int32),
+    )
+
+
+class _EnvSlice:
+    """The games ``start:stop`` of a VectorEnv, stepped in one process"""
+
+    def __init__(self, views, start, stop, seed, ticks_per_step, max_ticks, arrays):
+        state_class = GameState
+        if arrays:
+            from entity_store import ArrayGameState
+            state_class = ArrayGameState
+        obs, actions, rewards, dones, final_scores = views
+        self.obs = obs[start:stop]
+        self.actions = actions[start:stop]
+        self.rewards = rewards[start:stop]
+        self.dones = dones[start:stop]
+        self.final_scores = final_scores[start:stop]
+        self.ticks_per_step = ticks_per_step
+        self.max_ticks = max_ticks
+        # One seed stream per game, so results don't depend on the worker count
+        self.rngs = [random.Random(None if seed is None else seed * 1000003 + i) for i in range(start, stop)]
+        self.states = [state_class(rng.randrange(2 ** 32)) for rng in self.rngs]
+
+    def reset(self):
+        for i, state in enumerate(self.states):
+            state.reset(self.rngs[i].randrange(2 ** 32))
+            self._observe(i, state)
+        self.rewards[:] = 0
+        self.dones[:] = 0
+
+    def step(self):
+        ticks = self.ticks_per_step
+        max_ticks = self.max_ticks
+        actions = self.actions.tolist()
+        dones = self.dones.tolist()
+        for i, state in enumerate(self.states):
+            if dones[i]:
+                state.reset(self.rngs[i].randrange(2 ** 32))
+            score = state.score
+            inputs = actions[i]
+            for _ in range(ticks):
+                state.step(inputs, TICK_MS)
+                if state.game_over:
+                    break
+            self.rewards[i] = state.score - score
+            done = state.game_over or state.ticks >= max_ticks
+            self.dones[i] = done
+            if done:
+                self.final_scores[i] = state.score
+            self._observe(i, state)
+
+    def _observe(self, i, state):
+        row = self.obs[i]
+        row[:] = 0
+        targets = sorted(state.targets, key=lambda t: -t[1])[:MAX_TARGETS]
+        lasers = state.lasers[-MAX_LASERS:]
+        row[0] = state.paddle.x
+        row[1] = state.score
+        row[2] = len(targets)
+        row[3] = len(lasers)
+        if targets:
+            row[OBS_HEADER:OBS_HEADER + 2 * len(targets)] = [v for target in targets for v in target]
+        if lasers:
+            base = OBS_HEADER + 2 * MAX_TARGETS
+            row[base:base + 2 * len(lasers)] = [v for laser in reversed(lasers) for v in (laser.x, laser.y)]
+
+
+def _worker(conn, buffers, num_envs, start, stop, seed, ticks_per_step, max_ticks, arrays):
+    envs = _EnvSlice(_views(buffers, num_envs), start, stop, seed, ticks_per_step, max_ticks, arrays)
+    while True:
+        command = conn.recv_bytes()
+        if command == b'step':
+            envs.step()
+        elif command == b'reset':
+            envs.reset()
+        else:
+            break
+        conn.send_bytes(b'ok')
+    conn.close()
+
+
+class VectorEnv:
+    """``num_envs`` games stepped together, in ``workers`` processes (0: in-process)
+
+    ``step()`` and ``reset()`` return views of the shared arrays, which the
+    next call overwrites; copy them to keep them.
+    """
+
+    def __init__(self, num_envs, workers=0, seed=None, ticks_per_step=1, max_ticks=36000, arrays=False):
+        self.num_envs = num_envs
+        self._buffers = (
+            RawArray('f', num_envs * OBS_SIZE),
+            RawArray('b', num_envs),
+            RawArray('f', num_envs),
+            RawArray('b', num_envs),
+            RawArray('i', num_envs),
+        )
+        self.obs, self.actions, self.rewards, self.dones, self.final_scores = _views(self._buffers, num_envs)
+        options = (seed, ticks_per_step, max_ticks, arrays)
+
+        self._local = None
+        self._pipes = []
+        self._processes = []
+        if workers <= 0:
+            self._local = _EnvSlice((self.obs, self.actions, self.rewards, self.dones, self.final_scores),
+                                    0, num_envs, *options)
+            return
+        bounds = np.linspace(0, num_envs, min(workers, num_envs) + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, args=(child, self._buffers, num_envs, start, stop, *options),
+                name=f"vector_env:{start}-{stop}", daemon=True)
+            process.start()
+            child.close()
+            self._pipes.append(parent)
+            self._processes.append(process)
+
+    def _run(self, command):
+        if self._local is not None:
+            getattr(self._local, command.decode())()
+            return
+        for pipe in self._pipes:
+            pipe.send_bytes(command)
+        for pipe in self._pipes:
+            pipe.recv_bytes()
+
+    def reset(self):
+        """Start a new game in every slot and return the observations"""
+        self._run(b'reset')
+        return self.obs
+
+    def step(self, actions):
+        """Apply one input bitmask per game; return (observations, rewards, dones)"""
+        self.actions[:] = actions
+        self._run(b'step')
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for pipe in self._pipes:
+            try:
+                pipe.send_bytes(b'close')
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join()
+        self._pipes = []
+        self._processes = []
+
+
+def measure_throughput(num_envs, workers, steps, seed=0, **options):
+    """Steps per second (game ticks across all envs) under random actions"""
+    env = VectorEnv(num_envs, workers, seed=seed, **options)
+    try:
+        rng = np.random.default_rng(seed)
+        env.reset()
+        actions = rng.integers(0, 8, size=(steps, num_envs), dtype=np.int8)
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+    return steps * num_envs / elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure VectorEnv throughput")
+    parser.add_argument("--envs", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="worker counts to try (0 = in-process)")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--ticks-per-step", type=int, default=1)
+    parser.add_argument("--arrays", action="store_true", help="use the NumPy entity store")
+    args = parser.parse_args()
+
+    print(f"{multiprocessing.cpu_count()} CPUs, {args.envs} envs, {args.steps} steps")
+    baseline = None
+    for workers in args.workers:
+        rate = measure_throughput(args.envs, workers, args.steps,
+                                  ticks_per_step=args.ticks_per_step, arrays=args.arrays)
+        if workers == 1 or baseline is None:
+            baseline = rate
+        print(f"workers {workers}: {rate:,.0f} env steps/s ({rate / baseline:.2f}x)")